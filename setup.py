@@ -44,7 +44,6 @@ setup(
         "ninja>=1.10.0.post1",
         "picosvg>=0.22.1",
         "pillow>=7.2.0",
-        "regex>=2020.4.4",
         "toml>=0.10.1",
         "ufo2ft[cffsubr]>=2.24.0",
         "ufoLib2>=0.6.2",
@@ -0,0 +1,72 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Runs picosvg over many svgs in one process.
+
+Running the picosvg command once per svg spends most of its time starting the
+interpreter and importing picosvg, so the build hands this a batch of inputs
+followed by the matching outputs instead. Outputs newer than their input are left
+as they are.
+
+Usage:
+
+    $ python -m nanoemoji.batch_picosvg [--clip_to_viewbox] IN_1 ... IN_N OUT_1 ... OUT_N
+"""
+
+from absl import app
+from absl import flags
+from absl import logging
+from nanoemoji import config  # for --clip_to_viewbox
+from nanoemoji import util
+from pathlib import Path
+from picosvg.svg import SVG
+import sys
+
+
+FLAGS = flags.FLAGS
+
+
+def picosvg_file(clip_to_viewbox: bool, input_svg: Path, output_svg: Path):
+    # Does what the picosvg command does for one file
+    svg = SVG.parse(input_svg).topicosvg()
+    if clip_to_viewbox:
+        svg.clip_to_viewbox(inplace=True)
+    output_svg.write_text(svg.tostring(pretty_print=True))
+
+
+def main(argv):
+    args = util.expand_ninja_response_files(argv[1:])
+    if len(args) % 2 != 0:
+        raise ValueError(f"Expected inputs followed by as many outputs, got {args}")
+    n = len(args) // 2
+
+    # ninja reruns the whole batch when any one input changes, only redo stale outputs.
+    # Carry on past a bad input so it doesn't hold up the rest of the batch
+    failed = []
+    for input_svg, output_svg in zip(map(Path, args[:n]), map(Path, args[n:])):
+        if not util.is_stale(output_svg, input_svg):
+            continue
+        try:
+            picosvg_file(bool(FLAGS.clip_to_viewbox), input_svg, output_svg)
+        except Exception:
+            logging.exception(f"picosvg failed for {input_svg}")
+            if output_svg.is_file():
+                output_svg.unlink()
+            failed.append(str(input_svg))
+    if failed:
+        sys.exit(f"picosvg failed for {len(failed)} of {n} input(s): {failed}")
+
+
+if __name__ == "__main__":
+    app.run(main)
@@ -15,15 +15,21 @@
 """Helps deal with emoji codepoints."""
 
 import os
-import regex
+import re
 import absl
 
 
+# stdlib re has no repeated-group captures so grab the whole run of hex
+# sequences and split it afterwards
+_CODEPOINTS_RE = re.compile(r"(?:^emoji_u)?((?:[-_]?[0-9a-fA-F]+)+)")
+_HEX_RE = re.compile(r"[0-9a-fA-F]+")
+
+
 def from_filename(filename):
-    match = regex.search(r"(?:^emoji_u)?(?:[-_]?([0-9a-fA-F]{1,}))+", filename)
+    match = _CODEPOINTS_RE.search(filename)
     if not match:
         raise ValueError(f"Bad filename {filename}; unable to extract codepoints")
-    return tuple(int(s, 16) for s in match.captures(1))
+    return tuple(int(s, 16) for s in _HEX_RE.findall(match.group(1)))
 
 
 def string(codepoints):
@@ -13,9 +13,10 @@
 # limitations under the License.
 
 import dataclasses
+import functools
 import re
 from collections import deque
-from typing import ClassVar, Iterable, List, Optional, Sequence, Tuple
+from typing import ClassVar, Iterable, List, Mapping, Optional, Sequence, Tuple, Union
 
 # See https://www.w3.org/TR/css-color-4/#named-colors
 # Chrome DevTools:
@@ -272,7 +273,10 @@ class Color(Sequence):
         )
 
     def opaque(self) -> "Color":
-        return self._replace(alpha=1.0)
+        # called per paint when writing COLR; skip dataclasses.replace
+        if self.alpha == 1.0:
+            return self
+        return _opaque(self)
 
     def to_string(self) -> str:
         # A CSS or SVG friendly string
@@ -304,14 +308,34 @@ class Color(Sequence):
     def without_palette_index(self) -> "Color":
         if self.palette_index is None:
             return self
-        return self._replace(palette_index=None)
+        return Color(self.red, self.green, self.blue, self.alpha)
 
-    def index_from(self, palette: Sequence["Color"]) -> int:
+    def index_from(
+        self, palette: Union[Sequence["Color"], Mapping["Color", int]]
+    ) -> int:
         if self.is_current_color():
             return 0xFFFF
+        # prefer a precomputed color => index map, a list.index is O(n)
+        if isinstance(palette, Mapping):
+            return palette[self]
         return palette.index(self)
 
 
+@functools.lru_cache(maxsize=4096)
+def _opaque(color: Color) -> Color:
+    # translucent colors recur across many stops, make one opaque copy of each;
+    # bounded, a process may see the colors of many fonts
+    return Color(color.red, color.green, color.blue, 1.0, color.palette_index)
+
+
+def palette_index_map(palette: Sequence[Color]) -> Mapping[Color, int]:
+    """Map each color to its first index in palette, matching list.index."""
+    color_index = {}
+    for i, color in enumerate(palette):
+        color_index.setdefault(color, i)
+    return color_index
+
+
 def uniq_sort_cpal_colors(colors: Iterable[Color]) -> List[Color]:
     """Return list of unique colors sorted by CPAL palette entry index.
 
@@ -133,7 +133,7 @@ def _gradient_paint(ttfont: ttLib.TTFont, ot_paint: otTables.Paint) -> _Gradient
         )
         for stop in ot_paint.ColorLine.ColorStop
     )
-    extend = Extend((ot_paint.ColorLine.Extend,))
+    extend = Extend(ot_paint.ColorLine.Extend)
     if ot_paint.Format == PaintLinearGradient.format:
         return PaintLinearGradient(
             stops=stops,
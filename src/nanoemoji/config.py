@@ -19,11 +19,20 @@ try:
 except ImportError:
     import importlib_resources as resources  # pytype: disable=import-error
 
-import itertools
+import functools
 from pathlib import Path
 from picosvg.svg_transform import Affine2D
 import toml
-from typing import Any, Iterable, MutableMapping, NamedTuple, Optional, Tuple, Sequence
+from typing import (
+    Any,
+    FrozenSet,
+    Iterable,
+    MutableMapping,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Sequence,
+)
 
 from nanoemoji import util
 
@@ -145,6 +154,21 @@ class MasterConfig(NamedTuple):
         return position[0]
 
 
+# FontConfig's format checks run per master and per source while writing the build,
+# cache what they derive from its strings
+@functools.lru_cache(maxsize=None)
+def _color_formats(color_format: str) -> FrozenSet[str]:
+    return frozenset(color_format.split("_"))
+
+
+@functools.lru_cache(maxsize=None)
+def _suffix(output_file: str) -> str:
+    return Path(output_file).suffix
+
+
+_OT_SVG_FORMATS = ("picosvg", "picosvgz", "untouchedsvg", "untouchedsvgz")
+
+
 class FontConfig(NamedTuple):
     family: str = "An Emoji Family"
     output_file: str = "AnEmojiFamily.ttf"
@@ -177,11 +201,11 @@ class FontConfig(NamedTuple):
     source_names: Tuple[str, ...] = ()
 
     def _has_any(self, *color_formats) -> bool:
-        return bool(set(color_formats).intersection(self.color_format.split("_")))
+        return not _color_formats(self.color_format).isdisjoint(color_formats)
 
     @property
     def output_format(self):
-        return Path(self.output_file).suffix
+        return _suffix(self.output_file)
 
     @property
     def has_bitmaps(self) -> bool:
@@ -205,10 +229,7 @@ class FontConfig(NamedTuple):
 
     @property
     def is_ot_svg(self) -> bool:
-        return self._has_any(
-            "".join(p)
-            for p in itertools.product(("picosvg", "untouchedsvg"), ("", "z"))
-        )
+        return self._has_any(*_OT_SVG_FORMATS)
 
     def validate(self):
         for attr_name in (
@@ -288,7 +309,11 @@ def write(dest: Path, config: FontConfig):
             for m in config.masters
         },
     }
-    dest.write_text(toml.dumps(toml_cfg))
+    toml_str = toml.dumps(toml_cfg)
+    # Leave an identical file alone, ninja goes by its mtime
+    if dest.is_file() and dest.read_text() == toml_str:
+        return
+    dest.write_text(toml_str)
 
 
 def _resolve_config(
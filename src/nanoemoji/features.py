@@ -17,6 +17,7 @@
 # TODO if this is a qualified sequence create the unqualified version and vice versa
 
 
+from itertools import chain
 from nanoemoji.glyph import glyph_name
 
 
@@ -31,12 +32,12 @@ def generate_fea(rgi_sequences, feature_tag=DEFAULT_GSUB_FEATURE_TAG):
     rules.append("")
 
     rules.append(f"feature {feature_tag} {{")
-    for rgi in sorted(rgi_sequences):
-        if len(rgi) == 1:
-            continue
-        glyphs = [glyph_name(cp) for cp in rgi]
-        target = glyph_name(rgi)
-        rules.append("  sub %s by %s;" % (" ".join(glyphs), target))
+    rgi_sequences = sorted(rgi for rgi in rgi_sequences if len(rgi) > 1)
+    # the same few codepoints (ZWJ, skin tones, etc) recur across many sequences
+    cp_names = {cp: glyph_name(cp) for cp in set(chain.from_iterable(rgi_sequences))}
+    for rgi in rgi_sequences:
+        glyphs = " ".join(cp_names[cp] for cp in rgi)
+        rules.append(f"  sub {glyphs} by {glyph_name(rgi)};")
 
     rules.append(f"}} {feature_tag};")
     rules.append("")
@@ -28,17 +28,31 @@ MIN_FIXED = MIN_INT16
 MAX_FIXED = ((1 << 31) - 1) / (1 << 16)
 
 
+# These mostly see a couple of values at a time (dx, dy; sx, sy), where a plain
+# loop is cheaper than setting up all() over a generator
 def int16_safe(*values):
-    return all(almost_equal(v, int(v)) and MIN_INT16 <= v <= MAX_INT16 for v in values)
+    for v in values:
+        if not (almost_equal(v, int(v)) and MIN_INT16 <= v <= MAX_INT16):
+            return False
+    return True
 
 
 def f2dot14_safe(*values):
-    return all(MIN_F2DOT14 <= value <= MAX_F2DOT14 for value in values)
+    for value in values:
+        if not (MIN_F2DOT14 <= value <= MAX_F2DOT14):
+            return False
+    return True
 
 
 def fixed_safe(*values):
-    return all(MIN_FIXED <= value <= MAX_FIXED for value in values)
+    for value in values:
+        if not (MIN_FIXED <= value <= MAX_FIXED):
+            return False
+    return True
 
 
 def f2dot14_rotation_safe(*values):
-    return all(MIN_F2DOT14 <= (value / 180.0) <= MAX_F2DOT14 for value in values)
+    for value in values:
+        if not (MIN_F2DOT14 <= (value / 180.0) <= MAX_F2DOT14):
+            return False
+    return True
@@ -19,6 +19,7 @@ from absl import logging
 from picosvg.svg_reuse import normalize, affine_between
 from picosvg.svg_transform import Affine2D
 from picosvg.svg_types import SVGPath
+import sys
 from typing import (
     NamedTuple,
     Optional,
@@ -36,12 +37,27 @@ class GlyphReuseCache:
         self._reuse_tolerance = reuse_tolerance
         self._known_glyphs = set()
         self._reusable_paths = {}
+        # exact path => glyph name; an exact repeat needs no normalize/affine_between
+        self._glyph_by_path = {}
+        # path => normalized path; try_reuse and add_glyph are typically called
+        # back to back for the same path and normalize is not cheap
+        self._normalized_paths = {}
 
         # normalize tries to remap first two significant vectors to [1 0], [0 1]
         # reuse tolerence is relative to viewbox, which is typically much larger
         # than the space normalize operates in. TODO: better default.
         self._normalize_tolerance = self._reuse_tolerance / 10
 
+    def _normalize(self, path: str) -> str:
+        norm_path = self._normalized_paths.get(path)
+        if norm_path is None:
+            # intern so equal keys usually compare by identity
+            norm_path = sys.intern(
+                normalize(SVGPath(d=path), self._normalize_tolerance).d
+            )
+            self._normalized_paths[path] = norm_path
+        return norm_path
+
     def try_reuse(self, path: str) -> Optional[ReuseResult]:
         """Try to reproduce path as the transformation of another glyph.
 
@@ -57,7 +73,11 @@ class GlyphReuseCache:
         if self._reuse_tolerance == -1:
             return None
 
-        norm_path = normalize(SVGPath(d=path), self._normalize_tolerance).d
+        glyph_name = self._glyph_by_path.get(path)
+        if glyph_name is not None:
+            return ReuseResult(glyph_name, Affine2D.identity())
+
+        norm_path = self._normalize(path)
         if norm_path not in self._reusable_paths:
             return None
 
@@ -81,10 +101,11 @@ class GlyphReuseCache:
     def add_glyph(self, glyph_name, glyph_path):
         assert glyph_path.startswith("M"), f"{glyph_path} doesn't look like a path"
         if self._reuse_tolerance != -1:
-            norm_path = normalize(SVGPath(d=glyph_path), self._normalize_tolerance).d
+            norm_path = self._normalize(glyph_path)
         else:
             norm_path = glyph_path
         self._reusable_paths[norm_path] = (glyph_name, glyph_path)
+        self._glyph_by_path.setdefault(glyph_path, glyph_name)
         self._known_glyphs.add(glyph_name)
 
     def is_known_glyph(self, glyph_name):
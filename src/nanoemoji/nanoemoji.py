@@ -30,10 +30,13 @@ nanoemoji $(find ~/oss/twemoji/assets/svg -name '*.svg')
 from absl import app
 from absl import flags
 from absl import logging
+from collections import Counter
 from collections.abc import Iterable
+from concurrent.futures import ProcessPoolExecutor
 import functools
 import glob
-from nanoemoji import codepoints, config, write_font
+import io
+from nanoemoji import batch_picosvg, codepoints, config, write_font
 from nanoemoji.config import AxisPosition, FontConfig, MasterConfig
 from nanoemoji.ninja import (
     build_dir,
@@ -44,7 +47,6 @@ from nanoemoji.ninja import (
     NinjaWriter,
 )
 from nanoemoji.util import fs_root, rel, only, abspath, shell_quote
-import os
 from pathlib import Path
 import platform
 import re
@@ -64,6 +66,7 @@ from typing import (
     Set,
     Sequence,
 )
+import zlib
 
 
 FLAGS = flags.FLAGS
@@ -73,8 +76,15 @@ flags.DEFINE_bool(
     "gen_svg_font_diffs", False, "Whether to generate svg vs font render diffs."
 )
 flags.DEFINE_integer("svg_font_diff_resolution", 256, "Render diffs resolution")
+flags.DEFINE_bool(
+    "parallel_picosvg",
+    False,
+    "Whether to convert inputs to picosvg in a process pool before running ninja, "
+    "rather than having ninja run picosvg over batches of inputs.",
+)
 
 
+@functools.lru_cache()
 def self_dir() -> Path:
     return Path(__file__).parent.resolve()
 
@@ -95,8 +105,14 @@ def _bool_flag(name: str, value: bool):
     return flag
 
 
+# Keyed by output file rather than FontConfig, which is costly to hash
+@functools.lru_cache(maxsize=None)
+def _per_output_file(build_dir: Path, output_file: str, suffix: str) -> Path:
+    return build_dir / Path(output_file).with_suffix(suffix).name
+
+
 def _per_config_file(font_config: FontConfig, suffix: str) -> Path:
-    return build_dir() / Path(font_config.output_file).with_suffix(suffix).name
+    return _per_output_file(build_dir(), font_config.output_file, suffix)
 
 
 def _config_file(font_config: FontConfig) -> Path:
@@ -122,13 +138,6 @@ def _glyphmap_file(font_config: FontConfig, master: MasterConfig) -> Path:
     return _per_config_file(font_config, master_part + ".glyphmap")
 
 
-def _glyphmap_file(font_config: FontConfig, master: MasterConfig) -> Path:
-    master_part = ""
-    if font_config.is_vf:
-        master_part = "." + master.output_ufo
-    return _per_config_file(font_config, master_part + ".glyphmap")
-
-
 def write_glyphmap_rule(nw, glyphmap_generator):
     module_rule(
         nw,
@@ -158,24 +167,24 @@ def _chrome_command() -> str:
     return shell_quote(cmd)
 
 
-def write_preamble(nw):
-    nw.rule(
-        f"picosvg_unclipped",
-        f"picosvg "
-        + _bool_flag("clip_to_viewbox", False)
-        + " --output_file $out"
-        + " $in",
-    )
-    nw.newline()
+# How many inputs each picosvg or zopflipng process handles
+_PICOSVG_BATCH_SIZE = 64
+_ZOPFLIPNG_BATCH_SIZE = 32
 
-    nw.rule(
-        f"picosvg_clipped",
-        f"picosvg "
-        + _bool_flag("clip_to_viewbox", True)
-        + " --output_file $out"
-        + " $in",
-    )
-    nw.newline()
+
+def write_preamble(nw):
+    # picosvg a batch of svgs per process, see _write_batched_builds
+    for rule_name, clipped in (("picosvg_unclipped", False), ("picosvg_clipped", True)):
+        module_rule(
+            nw,
+            "batch_picosvg",
+            _bool_flag("clip_to_viewbox", clipped) + " @$batch_rsp",
+            rspfile="$batch_rsp",
+            rspfile_content="$in $out",
+            rule_name=rule_name,
+            restat=True,
+        )
+        nw.newline()
 
     module_rule(nw, "write_fea", "--output_file $out $in")
     nw.newline()
@@ -187,13 +196,14 @@ def write_preamble(nw):
     )
     nw.newline()
 
-    # -y is to always overwrite existing output without Y/N interactive prompt
-    zopfli_verbose = ""
-    if FLAGS.verbosity:
-        zopfli_verbose = "-v"
-    nw.rule(
+    # compresses a batch of bitmaps per process, see _write_batched_builds
+    module_rule(
+        nw,
         "zopflipng",
-        f"{sys.executable} -m zopfli.png {zopfli_verbose} -y $in $out",
+        "@$batch_rsp",
+        rspfile="$batch_rsp",
+        rspfile_content="$in $out",
+        restat=True,
     )
     nw.newline()
 
@@ -296,22 +306,56 @@ def diff_bitmap_dir() -> Path:
     return build_dir() / "imagediff" / "diff"
 
 
+@functools.lru_cache(maxsize=None)
+def _abspath_src(input_svg: Path) -> Path:
+    # Each source goes through several *_dest helpers, normalize it just once
+    return abspath(input_svg)
+
+
+@functools.lru_cache(maxsize=None)
+def _ensure_dir(path: Path):
+    # Several configs may share an output dir, only ask the filesystem once
+    path.mkdir(parents=True, exist_ok=True)
+
+
+# scope_fn => (names_seen, name_counts, dests), see _dest_for_src
+_dest_scopes = {}
+
+
+def _reset_dest_state():
+    # Dests depend on cwd and build_dir, and the N in .../N/name on which inputs
+    # came first; none of that carries over from one run to the next
+    _dest_scopes.clear()
+    _abspath_src.cache_clear()
+    _picosvg_dests.cache_clear()
+
+
 def _dest_for_src(scope_fn, out_dir: Path, input_svg: Path, suffix: str) -> Path:
-    if not hasattr(scope_fn, "names_seen"):
-        scope_fn.names_seen = {}
-    names_seen = scope_fn.names_seen
+    scope = _dest_scopes.get(scope_fn)
+    if scope is None:
+        # input => N, name => how many inputs have it, (out_dir, input, suffix) => dest
+        scope = _dest_scopes[scope_fn] = ({}, Counter(), {})
+    names_seen, name_counts, dests = scope
+
+    # The same dest is asked for repeatedly as the build is written out
+    input_svg = _abspath_src(input_svg)
+    key = (out_dir, input_svg, suffix)
+    dest = dests.get(key)
+    if dest is not None:
+        return dest
 
     # If  many different inputs have the same name disambiguate 1..N
     # by including N in picosvg path
-    input_svg = abspath(input_svg)
-    nth_of_name = 0
-    while names_seen.get((nth_of_name, input_svg.name), input_svg) != input_svg:
-        nth_of_name += 1
-    names_seen[(nth_of_name, input_svg.name)] = input_svg
+    nth_of_name = names_seen.get(input_svg)
+    if nth_of_name is None:
+        nth_of_name = names_seen[input_svg] = name_counts[input_svg.name]
+        name_counts[input_svg.name] += 1
 
     if nth_of_name > 0:
         out_dir = out_dir / str(nth_of_name)
-    return rel_build(out_dir / input_svg.name).with_suffix(suffix)
+    dest = rel_build(out_dir / input_svg.name).with_suffix(suffix)
+    dests[key] = dest
+    return dest
 
 
 def picosvg_dest(clipped: bool, input_svg: Path) -> Path:
@@ -357,6 +401,37 @@ def master_part_file_dest() -> Path:
     return Path("parts-merged.json")
 
 
+def _write_batched_builds(
+    nw: NinjaWriter,
+    rule_name: str,
+    edges: Sequence[Tuple[Path, Path]],
+    batch_size: int,
+    variables: Optional[Mapping[str, Any]] = None,
+):
+    # Builds of up to about batch_size (output, input) edges, for rules that read
+    # "$in $out" from $batch_rsp and, being restat rules, only redo stale outputs.
+    # Edges go to batches by a hash of their output rather than by position so an
+    # added or removed input leaves the other batches, and so their commands, alone;
+    # only doubling the number of batches moves edges around
+    if variables is None:
+        variables = {}
+    num_batches = 1
+    while num_batches * batch_size < len(edges):
+        num_batches *= 2
+    batches = [[] for _ in range(num_batches)]
+    for dest, infile in sorted(edges):
+        batches[zlib.crc32(str(dest).encode("utf-8")) % num_batches].append(
+            (dest, infile)
+        )
+    for batch in batches:
+        if not batch:
+            continue
+        dests, infiles = zip(*batch)
+        batch_variables = dict(variables)
+        batch_variables["batch_rsp"] = str(dests[0].with_suffix(".rsp"))
+        nw.build(list(dests), rule_name, list(infiles), variables=batch_variables)
+
+
 def write_picosvg_builds(
     picosvg_builds: Set[Path],
     nw: NinjaWriter,
@@ -367,32 +442,62 @@ def write_picosvg_builds(
     if font_config.clip_to_viewbox:
         rule_name = "picosvg_clipped"
 
-    picosvgs = set()
-    part_files = set()
+    picosvg_edges = []
+    part_edges = []
     for svg_file in master.sources:
-        svg_file = abspath(svg_file)
-        dest = picosvg_dest(font_config.clip_to_viewbox, svg_file)
+        svg_file = _abspath_src(svg_file)
         if svg_file in picosvg_builds:
             continue
         picosvg_builds.add(svg_file)
-        nw.build(dest, rule_name, rel_build(svg_file))
+        dest = picosvg_dest(font_config.clip_to_viewbox, svg_file)
+        picosvg_edges.append((dest, rel_build(svg_file)))
+        part_edges.append((part_file_dest(dest), dest))
 
-        part_dest = part_file_dest(dest)
-        nw.build(
-            part_dest,
-            "write_part_file",
-            dest,
-            variables={
-                "reuse_tolerance": font_config.reuse_tolerance,
-                "wh": font_config.ascender - font_config.descender,
-            },
-        )
+    if not FLAGS.parallel_picosvg:
+        _write_batched_builds(nw, rule_name, picosvg_edges, _PICOSVG_BATCH_SIZE)
+    nw.build_many(
+        "write_part_file",
+        part_edges,
+        variables={
+            "reuse_tolerance": font_config.reuse_tolerance,
+            "wh": font_config.ascender - font_config.descender,
+        },
+    )
 
-        picosvgs.add(dest)
-        part_files.add(part_dest)
+    picosvgs = {dest for dest, _ in picosvg_edges}
+    part_files = {part_dest for part_dest, _ in part_edges}
     return (picosvgs, part_files)
 
 
+def run_picosvgs(font_configs: Sequence[FontConfig]):
+    """Convert inputs to picosvg up front, in parallel.
+
+    Skips outputs newer than their input, much as ninja would.
+    """
+    jobs = {}  # output => (clip_to_viewbox, input)
+    for font_config in font_configs:
+        if not font_config.has_picosvgs:
+            continue
+        for master in font_config.masters:
+            for svg_file in master.sources:
+                svg_file = _abspath_src(svg_file)
+                dest = build_dir() / picosvg_dest(font_config.clip_to_viewbox, svg_file)
+                jobs.setdefault(dest, (font_config.clip_to_viewbox, svg_file))
+
+    stale = [
+        (clip_to_viewbox, svg_file, dest)
+        for dest, (clip_to_viewbox, svg_file) in jobs.items()
+        if not dest.is_file() or dest.stat().st_mtime < svg_file.stat().st_mtime
+    ]
+    logging.info(f"picosvg {len(stale)} of {len(jobs)} input(s)")
+    if not stale:
+        return
+    for dest in {dest.parent for _, _, dest in stale}:
+        _ensure_dir(dest)
+    with ProcessPoolExecutor() as executor:
+        list(executor.map(batch_picosvg.picosvg_file, *zip(*stale)))
+
+
 def write_bitmap_builds(
     bitmap_builds: Set[Path],
     nw: NinjaWriter,
@@ -400,15 +505,15 @@ def write_bitmap_builds(
     resolution: int,
     master: MasterConfig,
 ):
-    os.makedirs(str(bitmap_dir()), exist_ok=True)
+    _ensure_dir(bitmap_dir())
+    edges = []
     for svg_file in master.sources:
         dest = bitmap_dest(svg_file)
         if dest in bitmap_builds:
             continue
         bitmap_builds.add(dest)
-        nw.build(
-            dest, "write_bitmap", rel_build(svg_file), variables={"res": resolution}
-        )
+        edges.append((dest, rel_build(svg_file)))
+    nw.build_many("write_bitmap", edges, variables={"res": resolution})
 
 
 def write_compressed_bitmap_builds(
@@ -420,17 +525,24 @@ def write_compressed_bitmap_builds(
     infile_fn: Callable[[Path], Path],
     outfile_fn: Callable[[Path], Path],
     variables: Optional[Mapping[str, Any]] = None,
+    batch_size: int = 1,
 ):
     if variables is None:
         variables = {}
 
-    os.makedirs(str(dest_dir), exist_ok=True)
+    _ensure_dir(dest_dir)
+    pending = []
     for svg_file in master.sources:
         dest = outfile_fn(svg_file)
         if dest in builds:
             continue
         builds.add(dest)
-        nw.build(dest, rule_name, infile_fn(svg_file), variables=variables)
+        pending.append((dest, infile_fn(svg_file)))
+
+    if batch_size == 1:
+        nw.build_many(rule_name, pending, variables=variables)
+    else:
+        _write_batched_builds(nw, rule_name, pending, batch_size, variables)
 
 
 def write_fea_build(nw: NinjaWriter, font_config: FontConfig):
@@ -446,57 +558,56 @@ def write_svg_font_diff_build(
     nw: NinjaWriter, font_dest: str, svg_files: Sequence[Path], resolution: int
 ):
     # render each svg => png
-    for svg_file in svg_files:
-        nw.build(
-            svg2png_dest(svg_file),
-            "screenshot",
-            rel_build(svg_file),
-            variables={"res": resolution},
-        )
+    nw.build_many(
+        "screenshot",
+        ((svg2png_dest(f), rel_build(f)) for f in svg_files),
+        variables={"res": resolution},
+    )
     nw.newline()
 
     # copy the output font to the screenshot directory
     font_for_screenshots = font2png_dir() / "Font.ttf"
     nw.build(font_for_screenshots, "copy_font_to_screenshot_dir", font_dest)
+    nw.newline()
 
-    # make an html container for each input in the font
+    # for each input in the font make an html container, render it => png
+    # and compare with the svg rendering
+    diff_pngs = []
     for svg_file in svg_files:
-        inputs = [
-            font_for_screenshots,
-            rel_build(svg_file),
-        ]
+        html_dest = font2png_html_dest(svg_file)
+        png_dest = font2png_dest(svg_file)
+        diff_dest = diff_png_dest(svg_file)
         nw.build(
-            font2png_html_dest(svg_file),
+            html_dest,
             "write_font2png_html",
-            inputs,
+            [font_for_screenshots, rel_build(svg_file)],
             variables={"res": resolution},
         )
+        nw.build(png_dest, "screenshot", html_dest)
+        nw.build(diff_dest, "write_pngdiff", [svg2png_dest(svg_file), png_dest])
+        diff_pngs.append(diff_dest)
     nw.newline()
 
-    # render the html container => png
-    for svg_file in svg_files:
-        nw.build(font2png_dest(svg_file), "screenshot", font2png_html_dest(svg_file))
-    nw.newline()
+    # write report and kerplode if there are bad diffs
+    nw.build("diffs.html", "write_diffreport", diff_pngs)
 
-    # create comparison images
-    for svg_file in svg_files:
-        inputs = [
-            svg2png_dest(svg_file),
-            font2png_dest(svg_file),
-        ]
-        nw.build(diff_png_dest(svg_file), "write_pngdiff", inputs)
-    nw.newline()
 
-    # write report and kerplode if there are bad diffs
-    nw.build("diffs.html", "write_diffreport", [diff_png_dest(f) for f in svg_files])
+# Keyed by sources rather than master; hashing a tuple of (hash-caching) Paths is
+# cheap, and repeat lookups hit the same tuple so compare by identity. Only valid
+# for one run, like the _dest_for_src state it captures; see _reset_dest_state.
+@functools.lru_cache(maxsize=None)
+def _picosvg_dests(clipped: bool, sources: Tuple[Path, ...]) -> Tuple[Path, ...]:
+    return tuple(picosvg_dest(clipped, f) for f in sources)
+
+
+def _picosvg_sources(font_config: FontConfig, master: MasterConfig) -> Tuple[Path, ...]:
+    return _picosvg_dests(font_config.clip_to_viewbox, tuple(master.sources))
 
 
 def _input_files(font_config: FontConfig, master: MasterConfig) -> List[Path]:
     input_files = []
     if font_config.has_picosvgs:
-        input_files.extend(
-            picosvg_dest(font_config.clip_to_viewbox, f) for f in master.sources
-        )
+        input_files.extend(_picosvg_sources(font_config, master))
     if font_config.has_untouchedsvgs:
         input_files.extend(rel_build(f) for f in master.sources)
     if font_config.has_bitmaps:
@@ -514,17 +625,16 @@ def _input_files(font_config: FontConfig, master: MasterConfig) -> List[Path]:
 def _update_sources(font_config: FontConfig) -> FontConfig:
     if not font_config.has_picosvgs:
         return font_config
-    return font_config._replace(
-        masters=tuple(
-            master._replace(
-                sources=tuple(
-                    Path(picosvg_dest(font_config.clip_to_viewbox, s))
-                    for s in master.sources
-                )
-            )
-            for master in font_config.masters
-        )
-    )
+    masters = []
+    for master in font_config.masters:
+        sources = _picosvg_sources(font_config, master)
+        if sources != master.sources:
+            master = master._replace(sources=sources)
+        masters.append(master)
+    masters = tuple(masters)
+    if masters == font_config.masters:
+        return font_config
+    return font_config._replace(masters=masters)
 
 
 def write_glyphmap_build(
@@ -602,6 +712,9 @@ def _write_config_for_build(font_config: FontConfig):
 
 
 def _run(argv):
+    _reset_dest_state()
+    _ensure_dir.cache_clear()  # dirs may have been removed since the last run
+
     additional_srcs = tuple(Path(f) for f in argv if f.endswith(".svg"))
     font_configs = config.load_configs(
         tuple(Path(f) for f in argv if f.endswith(".toml")),
@@ -616,16 +729,12 @@ def _run(argv):
             "Try `pip install resvg-cli` or visit https://github.com/RazrFalcon/resvg."
         )
 
-    required_dirs = [build_dir()]
+    _ensure_dir(build_dir())
     if FLAGS.gen_svg_font_diffs:
-        required_dirs += [
-            svg2png_dir(),
-            font2png_dir(),
-            diff_bitmap_dir(),
-            picosvg_dir(),
-        ]
-    for required_dir in required_dirs:
-        required_dir.mkdir(parents=True, exist_ok=True)
+        for required_dir in (svg2png_dir(), font2png_dir(), diff_bitmap_dir()):
+            _ensure_dir(required_dir)
+        if any(fc.has_picosvgs for fc in font_configs):
+            _ensure_dir(picosvg_dir())
     build_file = build_dir() / "build.ninja"
 
     assert not FLAGS.gen_svg_font_diffs or (
@@ -640,38 +749,42 @@ def _run(argv):
     for font_config in font_configs:
         _write_config_for_build(font_config)
 
+    if FLAGS.parallel_picosvg:
+        run_picosvgs(font_configs)
+
     if gen_ninja():
         logging.info(f"Generating {build_file.relative_to(build_dir())}")
-        with open(build_file, "w") as f:
+        # Assemble the manifest in memory and write it out in one go
+        with io.StringIO() as f:
             nw = NinjaWriter(f)
             write_preamble(nw)
 
-            for glyphmap_generator in sorted(
-                {fc.glyphmap_generator for fc in font_configs}
+            # first-seen order, which is as stable as the order of configs
+            for glyphmap_generator in dict.fromkeys(
+                fc.glyphmap_generator for fc in font_configs
             ):
                 write_glyphmap_rule(nw, glyphmap_generator)
 
             # After rules, builds
+            config_masters = [(fc, m) for fc in font_configs for m in fc.masters]
 
             for font_config in font_configs:
                 write_fea_build(nw, font_config)
 
-            for font_config in font_configs:
-                for master in font_config.masters:
-                    write_glyphmap_build(nw, font_config, master)
+            for font_config, master in config_masters:
+                write_glyphmap_build(nw, font_config, master)
 
             picosvg_builds = set()  # svgs for which we already made a picosvg
             part_files = set()
-            for font_config in font_configs:
-                for master in font_config.masters:
-                    if font_config.has_picosvgs:
-                        _, parts = write_picosvg_builds(
-                            picosvg_builds,
-                            nw,
-                            font_config,
-                            master,
-                        )
-                        part_files |= parts
+            for font_config, master in config_masters:
+                if font_config.has_picosvgs:
+                    _, parts = write_picosvg_builds(
+                        picosvg_builds,
+                        nw,
+                        font_config,
+                        master,
+                    )
+                    part_files |= parts
             nw.newline()
 
             # Write a combined part file (potentially empty)
@@ -729,22 +842,23 @@ def _run(argv):
                         dest_dir=zopflipng_dir(),
                         infile_fn=zopflipng_infile_fn,
                         outfile_fn=zopflipng_dest,
+                        batch_size=_ZOPFLIPNG_BATCH_SIZE,
                     )
             nw.newline()
 
-            for font_config in font_configs:
-                if FLAGS.gen_svg_font_diffs:
-                    assert not font_config.is_vf
-                    write_svg_font_diff_build(
-                        nw,
-                        font_config.output_file,
-                        font_config.masters[0].sources,
-                        font_config.bitmap_resolution,
-                    )
+            if FLAGS.gen_svg_font_diffs:
+                font_config = only(font_configs)
+                assert not font_config.is_vf
+                write_svg_font_diff_build(
+                    nw,
+                    font_config.output_file,
+                    font_config.masters[0].sources,
+                    font_config.bitmap_resolution,
+                )
 
-                for master in font_config.masters:
-                    if font_config.is_vf:
-                        write_ufo_build(nw, font_config, master)
+            for font_config, master in config_masters:
+                if font_config.is_vf:
+                    write_ufo_build(nw, font_config, master)
 
             for font_config in font_configs:
                 if font_config.is_vf:
@@ -752,7 +866,12 @@ def _run(argv):
                 else:
                     write_static_font_build(nw, font_config)
 
-    maybe_run_ninja(build_file)
+            # ninja reads LF just fine, no need for CRLF translation on Windows
+            build_file.write_bytes(f.getvalue().encode("utf-8"))
+
+    # Nothing left to do after ninja so let it take over this process, except for
+    # --gen_svg_font_diffs runs which keep waiting on ninja as before
+    maybe_run_ninja(build_file, replace_process=not FLAGS.gen_svg_font_diffs)
 
 
 def main():
@@ -17,13 +17,15 @@
 
 from absl import flags
 from absl import logging
+import functools
 from nanoemoji.util import rel, quote_if_path
 from ninja import ninja_syntax
 import os
 from pathlib import Path
+import re
 import subprocess
 import sys
-from typing import MutableSequence
+from typing import Any, Iterable, Mapping, MutableSequence, Optional, Tuple
 
 
 FLAGS = flags.FLAGS
@@ -33,6 +35,16 @@ FLAGS = flags.FLAGS
 flags.DEFINE_string("build_dir", "build/", "Where build runs.")
 flags.DEFINE_bool("gen_ninja", True, "Whether to regenerate build.ninja")
 flags.DEFINE_bool("exec_ninja", True, "Whether to run ninja.")
+flags.DEFINE_integer(
+    "ninja_jobs",
+    0,
+    "How many jobs ninja runs in parallel. 0 means one per CPU, holding off new "
+    "jobs while the load average is above the CPU count + 2.",
+)
+
+
+# characters ninja_syntax.escape_path would have to escape
+_NEEDS_ESCAPE = re.compile(r"[$ :]")
 
 
 def _str_path(arg):
@@ -78,6 +90,34 @@ class NinjaWriter:
             variables=variables,
         )
 
+    def build_many(
+        self,
+        rule: str,
+        edges: Iterable[Tuple[Path, Path]],
+        variables: Optional[Mapping[str, Any]] = None,
+    ):
+        """Write a build of rule for each (output, input), all with the same variables.
+
+        Paths that need no escaping are formatted directly and written out in one go,
+        skipping ninja_syntax's per-build overhead; any others take the slow path.
+        """
+        if variables is None:
+            variables = {}
+        var_lines = "".join(
+            f"  {k} = {quote_if_path(v)}\n" for k, v in variables.items()
+        )
+        output = self._nw.output
+        lines = []
+        for dest, src in edges:
+            dest, src = str(dest), str(src)
+            if _NEEDS_ESCAPE.search(dest) or _NEEDS_ESCAPE.search(src):
+                output.write("".join(lines))
+                lines.clear()
+                self.build(dest, rule, src, variables=variables)
+                continue
+            lines.append(f"build {dest}: {rule} {src}\n{var_lines}")
+        output.write("".join(lines))
+
     def newline(self):
         self._nw.newline()
 
@@ -85,12 +125,28 @@ class NinjaWriter:
         self._nw.comment(comment)
 
 
+@functools.lru_cache(maxsize=None)
+def _resolved_build_dir(cwd: str, build_dir: str) -> Path:
+    return (Path(cwd) / build_dir).resolve()
+
+
 def build_dir() -> Path:
-    return Path(FLAGS.build_dir).resolve()
+    # Called for just about every path in the build, resolve (stat) the flag once;
+    # a relative --build_dir depends on cwd too
+    return _resolved_build_dir(os.getcwd(), FLAGS.build_dir)
+
+
+@functools.lru_cache(maxsize=None)
+def _rel_build(build_dir: Path, path: Path) -> Path:
+    return rel(build_dir, path)
 
 
 def rel_build(path: Path) -> Path:
-    return rel(build_dir(), path)
+    # The same sources and build files are referred to over and over. build_dir() is
+    # absolute, a relative path is relative to cwd so it isn't cached
+    if not path.is_absolute():
+        return rel(build_dir(), path)
+    return _rel_build(build_dir(), path)
 
 
 def gen_ninja() -> bool:
@@ -105,6 +161,7 @@ def module_rule(
     rspfile_content=None,
     rule_name=None,
     allow_external=False,
+    restat=False,
 ):
     if not rule_name:
         rule_name = mod_name
@@ -115,13 +172,28 @@ def module_rule(
         f"{sys.executable} -m {mod_name} -v {FLAGS.verbosity} {arg_pattern}",
         rspfile=rspfile,
         rspfile_content=rspfile_content,
+        restat=restat,
     )
 
 
-def maybe_run_ninja(build_file: Path):
+def maybe_run_ninja(build_file: Path, replace_process: bool = False):
+    """Run ninja on build_file, if --exec_ninja.
+
+    With replace_process, for callers with nothing left to do afterwards, ninja is
+    exec'd in place of this process (POSIX only) rather than waited on.
+    """
     ninja_cmd = ["ninja", "-C", os.path.dirname(build_file)]
+    if FLAGS.ninja_jobs > 0:
+        ninja_cmd.append(f"-j{FLAGS.ninja_jobs}")
+    else:
+        cpus = os.cpu_count() or 1
+        ninja_cmd.extend((f"-j{cpus}", f"-l{cpus + 2}"))
     if FLAGS.exec_ninja:
         logging.info(" ".join(ninja_cmd))
+        if replace_process and os.name == "posix":
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os.execvp(ninja_cmd[0], ninja_cmd)
         subprocess.run(ninja_cmd, check=True)
     else:
         logging.info("To run: " + " ".join(ninja_cmd))
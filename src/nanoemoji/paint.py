@@ -16,9 +16,11 @@
 
 Based on https://github.com/googlefonts/colr-gradients-spec/blob/main/colr-gradients-spec.md#structure-of-gradient-colr-v1-extensions.
 """
+from collections import deque
 import dataclasses
+import functools
 from abc import ABC, abstractmethod
-from enum import Enum, IntEnum
+from enum import IntEnum
 from absl import logging
 from fontTools.ttLib.tables import otTables as ot
 from math import copysign, radians
@@ -33,22 +35,31 @@ from nanoemoji.fixed import (
 )
 from picosvg.geometric_types import Point, almost_equal
 from picosvg.svg_transform import Affine2D
+import sys
 from typing import (
     Any,
+    Callable,
     ClassVar,
     Generator,
     Iterable,
     Mapping,
+    MutableMapping,
+    NamedTuple,
     Optional,
     Sequence,
     Tuple,
+    Union,
 )
 
 
-class Extend(Enum):
-    PAD = (0,)
-    REPEAT = (1,)
-    REFLECT = (2,)
+class Extend(IntEnum):
+    PAD = 0
+    REPEAT = 1
+    REFLECT = 2
+
+
+# as spelled in ufo2ft's ColorLine, avoids Enum.name lookups per gradient
+_EXTEND_NAMES = {e: e.name.lower() for e in Extend}
 
 
 # Porter-Duff modes for COLRv1 PaintComposite:
@@ -84,6 +95,9 @@ class CompositeMode(IntEnum):
     HSL_LUMINOSITY = 27
 
 
+_COMPOSITE_MODE_NAMES = {m: m.name.lower() for m in CompositeMode}
+
+
 def _identity(v):
     return v
 
@@ -96,104 +110,165 @@ _PAINT_FIELD_TO_OT_FIELD = {
 }
 
 
-@dataclasses.dataclass(frozen=True)
-class PaintTraverseContext:
+# how Paint.from_ot reads each field: a plain attribute, a converted attribute or
+# a tuple of several (e.g. centerX, centerY)
+_OT_ATTR, _OT_CONVERTED_ATTR, _OT_ATTR_TUPLE = range(3)
+
+
+@functools.lru_cache(maxsize=None)
+def _ot_field_bindings(paint_t) -> Tuple[Tuple[int, Any, Callable[[Any], Any]], ...]:
+    # (kind, ot field name(s), converter) per dataclass field of paint_t, in order
+    bindings = []
+    for f in dataclasses.fields(paint_t):
+        ot_field, converter = _PAINT_FIELD_TO_OT_FIELD.get(f.name, (f.name, _identity))
+        if isinstance(ot_field, tuple):
+            kind = _OT_ATTR_TUPLE
+        elif converter is _identity:
+            kind = _OT_ATTR
+        else:
+            kind = _OT_CONVERTED_ATTR
+        bindings.append((kind, ot_field, converter))
+    return tuple(bindings)
+
+
+# the default paint color; Color is a frozen dataclass, safe to share
+_BLACK = Color.fromstring("black")
+
+
+# Affine2D is an immutable NamedTuple, shared by every paint that doesn't transform
+_IDENTITY = Affine2D.identity()
+
+
+# Paint trees for a whole font are big, keep their nodes small where we can
+_SLOTS = {"slots": True} if sys.version_info >= (3, 10) else {}
+
+
+class PaintTraverseContext(NamedTuple):
     path: Tuple["Paint", ...]
     paint: "Paint"
     transform: Affine2D
 
 
-@dataclasses.dataclass(frozen=True)
+@dataclasses.dataclass(frozen=True, **_SLOTS)
 class ColorStop:
     stopOffset: float = 0.0
-    color: Color = Color.fromstring("black")
+    color: Color = _BLACK
 
     def round(self, ndigits: int) -> "ColorStop":
         return dataclasses.replace(self, stopOffset=round(self.stopOffset, ndigits))
 
 
 class Paint(ABC):
+    __slots__ = ()  # lets subclasses declared with _SLOTS do without __dict__
+
     format: ClassVar[int] = -1  # so pytype knows all Paint have format
 
-    @abstractmethod
-    def colors(self) -> Generator[Color, None, None]:
-        ...
+    def colors(self) -> Iterable[Color]:
+        # leaf paints override this to return a tuple; for the rest walk the subtree
+        # depth-first with an explicit stack rather than nesting generators
+        stack = [self]
+        while stack:
+            paint = stack.pop()
+            if type(paint).colors is Paint.colors:
+                stack.extend(reversed(paint.children()))
+            else:
+                yield from paint.colors()
 
     @abstractmethod
-    def to_ufo_paint(self, colors: Sequence[Color]):
+    def to_ufo_paint(
+        self,
+        colors: Union[Sequence[Color], Mapping[Color, int]],
+        ufo_paints: Optional[MutableMapping["Paint", Any]] = None,
+    ):
+        # colors is the palette, or better its palette_index_map, see Color.index_from.
+        # ufo_paints, if given, is where leaf paints keep their results for reuse
+        # with the same colors, see _reuse_ufo_paint
         ...
 
     def breadth_first(self) -> Generator[PaintTraverseContext, None, None]:
-        frontier = [PaintTraverseContext((), self, Affine2D.identity())]
+        frontier = deque([PaintTraverseContext((), self, _IDENTITY)])
         while frontier:
-            context = frontier.pop(0)
+            context = frontier.popleft()
             yield context
+            children = context.paint.children()
+            if not children:
+                continue
+            # one path and transform for all the children, leaves don't need either
+            path = context.path + (context.paint,)
             transform = context.transform
             paint_transform = context.paint.gettransform()
-            transform = Affine2D.compose_ltr(
-                (
-                    transform,
-                    paint_transform,
-                )
+            if paint_transform is not _IDENTITY and paint_transform != _IDENTITY:
+                # same as Affine2D.compose_ltr((transform, paint_transform))
+                transform = paint_transform @ transform
+            frontier.extend(
+                PaintTraverseContext(path, paint, transform) for paint in children
             )
-            for paint in context.paint.children():
-                frontier.append(
-                    PaintTraverseContext(
-                        context.path + (context.paint,), paint, transform
-                    )
-                )
 
     def children(self) -> Iterable["Paint"]:
         return ()
 
     def gettransform(self) -> Affine2D:
         # Returns the transform caused by this Paint (not it's ancestors)
-        return Affine2D.identity()
+        return _IDENTITY
 
     @classmethod
     def from_ot(cls, ot_paint: ot.Paint) -> "Paint":
-        paint_t = globals()[ot_paint.getFormatName()]
+        paint_t = _PAINT_CLASSES[ot_paint.getFormatName()]
         paint_args = []
-        for f in dataclasses.fields(paint_t):
-            ot_field, converter = _PAINT_FIELD_TO_OT_FIELD.get(
-                f.name, (f.name, _identity)
-            )
-            if isinstance(ot_field, tuple):
-                arg = tuple(converter(getattr(ot_paint, f)) for f in ot_field)
-            else:
+        for kind, ot_field, converter in _ot_field_bindings(paint_t):
+            if kind == _OT_ATTR:
+                arg = getattr(ot_paint, ot_field)
+            elif kind == _OT_CONVERTED_ATTR:
                 arg = converter(getattr(ot_paint, ot_field))
+            else:
+                arg = tuple(converter(getattr(ot_paint, f)) for f in ot_field)
             paint_args.append(arg)
         paint = paint_t(*paint_args)
         return paint
 
 
-@dataclasses.dataclass(frozen=True)
+@dataclasses.dataclass(frozen=True, **_SLOTS)
 class PaintColrLayers(Paint):
     format: ClassVar[int] = int(ot.PaintFormat.PaintColrLayers)
     layers: Tuple[Paint, ...]
 
-    def colors(self):
-        for p in self.layers:
-            yield from p.colors()
-
-    def to_ufo_paint(self, colors):
+    def to_ufo_paint(self, colors, ufo_paints=None):
         return {
             "Format": self.format,
-            "Layers": [p.to_ufo_paint(colors) for p in self.layers],
+            "Layers": [p.to_ufo_paint(colors, ufo_paints) for p in self.layers],
         }
 
     def children(self):
         return self.layers
 
 
-@dataclasses.dataclass(frozen=True)
+def _reuse_ufo_paint(to_ufo_paint):
+    # Leaf paints recur across glyphs (same fills, same gradients). The caller owns
+    # ufo_paints and keeps it for as long as colors holds, e.g. write_font._colr_ufo
+    # for one font. Sharing the dicts within it is fine, fontTools' colorLib copies
+    # each paint dict before its build callbacks modify it (see _split_format in
+    # fontTools.colorLib.table_builder).
+    @functools.wraps(to_ufo_paint)
+    def wrapper(self, colors, ufo_paints=None):
+        if ufo_paints is None:
+            return to_ufo_paint(self, colors)
+        ufo_paint = ufo_paints.get(self)
+        if ufo_paint is None:
+            ufo_paint = ufo_paints[self] = to_ufo_paint(self, colors)
+        return ufo_paint
+
+    return wrapper
+
+
+@dataclasses.dataclass(frozen=True, **_SLOTS)
 class PaintSolid(Paint):
     format: ClassVar[int] = int(ot.PaintFormat.PaintSolid)
-    color: Color = Color.fromstring("black")
+    color: Color = _BLACK
 
     def colors(self):
-        yield self.color
+        return (self.color,)
 
+    @_reuse_ufo_paint
     def to_ufo_paint(self, colors):
         return {
             "Format": self.format,
@@ -212,11 +287,18 @@ def _ufoColorLine(gradient, colors):
             }
             for stop in gradient.stops
         ],
-        "Extend": gradient.extend.name.lower(),
+        "Extend": _EXTEND_NAMES[gradient.extend],
     }
 
 
-@dataclasses.dataclass(frozen=True)
+@functools.lru_cache(maxsize=4096)
+def _default_p2(p0: Point, p1: Point) -> Point:
+    # the same gradient geometry recurs across glyphs, e.g. objectBoundingBox units;
+    # bounded, the points are arbitrary floats
+    return p0 + (p1 - p0).perpendicular()
+
+
+@dataclasses.dataclass(frozen=True, **_SLOTS)
 class PaintLinearGradient(Paint):
     format: ClassVar[int] = int(ot.PaintFormat.PaintLinearGradient)
     extend: Extend = Extend.PAD
@@ -227,14 +309,18 @@ class PaintLinearGradient(Paint):
 
     def __post_init__(self):
         if self.p2 is None:
-            p0, p1 = Point(*self.p0), Point(*self.p1)
+            p0, p1 = self.p0, self.p1
+            if not isinstance(p0, Point):
+                p0 = Point(*p0)
+            if not isinstance(p1, Point):
+                p1 = Point(*p1)
             # use object.__setattr__ as the dataclass is frozen
-            object.__setattr__(self, "p2", p0 + (p1 - p0).perpendicular())
+            object.__setattr__(self, "p2", _default_p2(p0, p1))
 
     def colors(self):
-        for stop in self.stops:
-            yield stop.color
+        return tuple(stop.color for stop in self.stops)
 
+    @_reuse_ufo_paint
     def to_ufo_paint(self, colors):
         return {
             "Format": self.format,
@@ -248,6 +334,10 @@ class PaintLinearGradient(Paint):
         }
 
     def check_overflows(self) -> "PaintLinearGradient":
+        coords = (*self.p0, *self.p1, *self.p2)
+        if MIN_INT16 <= min(coords) and max(coords) <= MAX_INT16:
+            return self
+        # find the offending coordinate for the error message
         for i in range(3):
             attr_name = f"p{i}"
             value = getattr(self, attr_name)
@@ -310,7 +400,7 @@ def _decompose_uniform_transform(transform: Affine2D) -> Tuple[Affine2D, Affine2
     return uniform_transform, remaining_transform
 
 
-@dataclasses.dataclass(frozen=True)
+@dataclasses.dataclass(frozen=True, **_SLOTS)
 class PaintRadialGradient(Paint):
     format: ClassVar[int] = int(ot.PaintFormat.PaintRadialGradient)
     extend: Extend = Extend.PAD
@@ -321,9 +411,9 @@ class PaintRadialGradient(Paint):
     r1: float = 0.0
 
     def colors(self):
-        for stop in self.stops:
-            yield stop.color
+        return tuple(stop.color for stop in self.stops)
 
+    @_reuse_ufo_paint
     def to_ufo_paint(self, colors):
         paint = {
             "Format": self.format,
@@ -338,6 +428,15 @@ class PaintRadialGradient(Paint):
         return paint
 
     def check_overflows(self) -> "PaintRadialGradient":
+        centers = (*self.c0, *self.c1)
+        if (
+            MIN_INT16 <= min(centers)
+            and max(centers) <= MAX_INT16
+            and MIN_UINT16 <= min(self.r0, self.r1)
+            and max(self.r0, self.r1) <= MAX_UINT16
+        ):
+            return self
+        # find the offending field for the error message
         int_bounds = {
             "c": (MIN_INT16, MAX_INT16),
             "r": (MIN_UINT16, MAX_UINT16),
@@ -397,20 +496,17 @@ class PaintRadialGradient(Paint):
 # TODO PaintSweepGradient
 
 
-@dataclasses.dataclass(frozen=True)
+@dataclasses.dataclass(frozen=True, **_SLOTS)
 class PaintGlyph(Paint):
     format: ClassVar[int] = int(ot.PaintFormat.PaintGlyph)
     glyph: str
     paint: Paint
 
-    def colors(self):
-        yield from self.paint.colors()
-
-    def to_ufo_paint(self, colors):
+    def to_ufo_paint(self, colors, ufo_paints=None):
         paint = {
             "Format": self.format,
             "Glyph": self.glyph,
-            "Paint": self.paint.to_ufo_paint(colors),
+            "Paint": self.paint.to_ufo_paint(colors, ufo_paints),
         }
         return paint
 
@@ -418,17 +514,49 @@ class PaintGlyph(Paint):
         return (self.paint,)
 
 
-@dataclasses.dataclass(frozen=True)
+@dataclasses.dataclass(frozen=True, **_SLOTS)
 class PaintColrGlyph(Paint):
     format: ClassVar[int] = int(ot.PaintFormat.PaintColrGlyph)
     glyph: str
 
-    def to_ufo_paint(self, _):
+    def to_ufo_paint(self, _, ufo_paints=None):
         paint = {"Format": self.format, "Glyph": self.glyph}
         return paint
 
 
+# Paints are frozen so their transforms are a pure function of a few numbers; key
+# on those rather than on the paint, whose hash would walk the whole subtree.
+# Bounded, the keys are arbitrary floats and a process may compile many fonts.
+_TRANSFORM_CACHE_SIZE = 4096
+
+
+@functools.lru_cache(maxsize=_TRANSFORM_CACHE_SIZE)
+def _translate_transform(dx, dy) -> Affine2D:
+    return _IDENTITY.translate(dx, dy)
+
+
+@functools.lru_cache(maxsize=_TRANSFORM_CACHE_SIZE)
+def _scale_transform(sx, sy, cx=0, cy=0) -> Affine2D:
+    return _IDENTITY.translate(cx, cy).scale(sx, sy).translate(-cx, -cy)
+
+
+@functools.lru_cache(maxsize=_TRANSFORM_CACHE_SIZE)
+def _rotate_transform(angle, cx=0.0, cy=0.0) -> Affine2D:
+    return _IDENTITY.rotate(radians(angle), cx, cy)
+
+
+@functools.lru_cache(maxsize=_TRANSFORM_CACHE_SIZE)
+def _skew_transform(x_angle, y_angle, cx=0, cy=0) -> Affine2D:
+    return (
+        _IDENTITY.translate(cx, cy)
+        .skew(-radians(x_angle), radians(y_angle))
+        .translate(-cx, -cy)
+    )
+
+
 class _BasePaintTransform(Paint):
+    __slots__ = ()
+
     paint: Paint
 
     @abstractmethod
@@ -436,20 +564,17 @@ class _BasePaintTransform(Paint):
         ...
 
 
-@dataclasses.dataclass(frozen=True)
+@dataclasses.dataclass(frozen=True, **_SLOTS)
 class PaintTransform(_BasePaintTransform):
     format: ClassVar[int] = int(ot.PaintFormat.PaintTransform)
     transform: Tuple[float, float, float, float, float, float]
     paint: Paint
 
-    def colors(self):
-        yield from self.paint.colors()
-
-    def to_ufo_paint(self, colors):
+    def to_ufo_paint(self, colors, ufo_paints=None):
         paint = {
             "Format": self.format,
             "Transform": self.transform,
-            "Paint": self.paint.to_ufo_paint(colors),
+            "Paint": self.paint.to_ufo_paint(colors, ufo_paints),
         }
         return paint
 
@@ -460,20 +585,17 @@ class PaintTransform(_BasePaintTransform):
         return Affine2D(*self.transform)
 
 
-@dataclasses.dataclass(frozen=True)
+@dataclasses.dataclass(frozen=True, **_SLOTS)
 class PaintTranslate(_BasePaintTransform):
     format: ClassVar[int] = int(ot.PaintFormat.PaintTranslate)
     paint: Paint
     dx: int
     dy: int
 
-    def colors(self):
-        yield from self.paint.colors()
-
-    def to_ufo_paint(self, colors):
+    def to_ufo_paint(self, colors, ufo_paints=None):
         paint = {
             "Format": self.format,
-            "Paint": self.paint.to_ufo_paint(colors),
+            "Paint": self.paint.to_ufo_paint(colors, ufo_paints),
             "dx": self.dx,
             "dy": self.dy,
         }
@@ -483,23 +605,20 @@ class PaintTranslate(_BasePaintTransform):
         return (self.paint,)
 
     def gettransform(self) -> Affine2D:
-        return Affine2D.identity().translate(self.dx, self.dy)
+        return _translate_transform(self.dx, self.dy)
 
 
-@dataclasses.dataclass(frozen=True)
+@dataclasses.dataclass(frozen=True, **_SLOTS)
 class PaintScale(_BasePaintTransform):
     format: ClassVar[int] = int(ot.PaintFormat.PaintScale)
     paint: Paint
     scaleX: float = 1.0
     scaleY: float = 1.0
 
-    def colors(self):
-        yield from self.paint.colors()
-
-    def to_ufo_paint(self, colors):
+    def to_ufo_paint(self, colors, ufo_paints=None):
         paint = {
             "Format": self.format,
-            "Paint": self.paint.to_ufo_paint(colors),
+            "Paint": self.paint.to_ufo_paint(colors, ufo_paints),
             "scaleX": self.scaleX,
             "scaleY": self.scaleY,
         }
@@ -509,10 +628,10 @@ class PaintScale(_BasePaintTransform):
         return (self.paint,)
 
     def gettransform(self) -> Affine2D:
-        return Affine2D.identity().scale(self.scaleX, self.scaleY)
+        return _scale_transform(self.scaleX, self.scaleY)
 
 
-@dataclasses.dataclass(frozen=True)
+@dataclasses.dataclass(frozen=True, **_SLOTS)
 class PaintScaleAroundCenter(_BasePaintTransform):
     format: ClassVar[int] = int(ot.PaintFormat.PaintScaleAroundCenter)
     paint: Paint
@@ -520,13 +639,10 @@ class PaintScaleAroundCenter(_BasePaintTransform):
     scaleY: float = 1.0
     center: Point = Point()
 
-    def colors(self):
-        yield from self.paint.colors()
-
-    def to_ufo_paint(self, colors):
+    def to_ufo_paint(self, colors, ufo_paints=None):
         paint = {
             "Format": self.format,
-            "Paint": self.paint.to_ufo_paint(colors),
+            "Paint": self.paint.to_ufo_paint(colors, ufo_paints),
             "scaleX": self.scaleX,
             "scaleY": self.scaleY,
             "centerX": self.center[0],
@@ -538,27 +654,19 @@ class PaintScaleAroundCenter(_BasePaintTransform):
         return (self.paint,)
 
     def gettransform(self) -> Affine2D:
-        return (
-            Affine2D.identity()
-            .translate(self.center[0], self.center[1])
-            .scale(self.scaleX, self.scaleY)
-            .translate(-self.center[0], -self.center[1])
-        )
+        return _scale_transform(self.scaleX, self.scaleY, *self.center)
 
 
-@dataclasses.dataclass(frozen=True)
+@dataclasses.dataclass(frozen=True, **_SLOTS)
 class PaintScaleUniform(_BasePaintTransform):
     format: ClassVar[int] = int(ot.PaintFormat.PaintScaleUniform)
     paint: Paint
     scale: float = 1.0
 
-    def colors(self):
-        yield from self.paint.colors()
-
-    def to_ufo_paint(self, colors):
+    def to_ufo_paint(self, colors, ufo_paints=None):
         paint = {
             "Format": self.format,
-            "Paint": self.paint.to_ufo_paint(colors),
+            "Paint": self.paint.to_ufo_paint(colors, ufo_paints),
             "scale": self.scale,
         }
         return paint
@@ -567,23 +675,20 @@ class PaintScaleUniform(_BasePaintTransform):
         return (self.paint,)
 
     def gettransform(self) -> Affine2D:
-        return Affine2D.identity().scale(self.scale)
+        return _scale_transform(self.scale, self.scale)
 
 
-@dataclasses.dataclass(frozen=True)
+@dataclasses.dataclass(frozen=True, **_SLOTS)
 class PaintScaleUniformAroundCenter(_BasePaintTransform):
     format: ClassVar[int] = int(ot.PaintFormat.PaintScaleUniformAroundCenter)
     paint: Paint
     scale: float = 1.0
     center: Point = Point()
 
-    def colors(self):
-        yield from self.paint.colors()
-
-    def to_ufo_paint(self, colors):
+    def to_ufo_paint(self, colors, ufo_paints=None):
         paint = {
             "Format": self.format,
-            "Paint": self.paint.to_ufo_paint(colors),
+            "Paint": self.paint.to_ufo_paint(colors, ufo_paints),
             "scale": self.scale,
             "centerX": self.center[0],
             "centerY": self.center[1],
@@ -594,27 +699,19 @@ class PaintScaleUniformAroundCenter(_BasePaintTransform):
         return (self.paint,)
 
     def gettransform(self) -> Affine2D:
-        return (
-            Affine2D.identity()
-            .translate(self.center[0], self.center[1])
-            .scale(self.scale)
-            .translate(-self.center[0], -self.center[1])
-        )
+        return _scale_transform(self.scale, self.scale, *self.center)
 
 
-@dataclasses.dataclass(frozen=True)
+@dataclasses.dataclass(frozen=True, **_SLOTS)
 class PaintRotate(_BasePaintTransform):
     format: ClassVar[int] = int(ot.PaintFormat.PaintRotate)
     paint: Paint
     angle: float = 0.0
 
-    def colors(self):
-        yield from self.paint.colors()
-
-    def to_ufo_paint(self, colors):
+    def to_ufo_paint(self, colors, ufo_paints=None):
         paint = {
             "Format": self.format,
-            "Paint": self.paint.to_ufo_paint(colors),
+            "Paint": self.paint.to_ufo_paint(colors, ufo_paints),
             "angle": self.angle,
         }
         return paint
@@ -623,23 +720,20 @@ class PaintRotate(_BasePaintTransform):
         return (self.paint,)
 
     def gettransform(self) -> Affine2D:
-        return Affine2D.identity().rotate(radians(self.angle))
+        return _rotate_transform(self.angle)
 
 
-@dataclasses.dataclass(frozen=True)
+@dataclasses.dataclass(frozen=True, **_SLOTS)
 class PaintRotateAroundCenter(_BasePaintTransform):
     format: ClassVar[int] = int(ot.PaintFormat.PaintRotateAroundCenter)
     paint: Paint
     angle: float = 0.0
     center: Point = Point()
 
-    def colors(self):
-        yield from self.paint.colors()
-
-    def to_ufo_paint(self, colors):
+    def to_ufo_paint(self, colors, ufo_paints=None):
         paint = {
             "Format": self.format,
-            "Paint": self.paint.to_ufo_paint(colors),
+            "Paint": self.paint.to_ufo_paint(colors, ufo_paints),
             "angle": self.angle,
             "centerX": self.center[0],
             "centerY": self.center[1],
@@ -650,25 +744,20 @@ class PaintRotateAroundCenter(_BasePaintTransform):
         return (self.paint,)
 
     def gettransform(self) -> Affine2D:
-        return Affine2D.identity().rotate(
-            radians(self.angle), self.center[0], self.center[1]
-        )
+        return _rotate_transform(self.angle, *self.center)
 
 
-@dataclasses.dataclass(frozen=True)
+@dataclasses.dataclass(frozen=True, **_SLOTS)
 class PaintSkew(Paint):
     format: ClassVar[int] = int(ot.PaintFormat.PaintSkew)
     paint: Paint
     xSkewAngle: float = 0.0
     ySkewAngle: float = 0.0
 
-    def colors(self):
-        yield from self.paint.colors()
-
-    def to_ufo_paint(self, colors):
+    def to_ufo_paint(self, colors, ufo_paints=None):
         paint = {
             "Format": self.format,
-            "Paint": self.paint.to_ufo_paint(colors),
+            "Paint": self.paint.to_ufo_paint(colors, ufo_paints),
             "xSkewAngle": self.xSkewAngle,
             "ySkewAngle": self.ySkewAngle,
         }
@@ -678,12 +767,10 @@ class PaintSkew(Paint):
         return (self.paint,)
 
     def gettransform(self) -> Affine2D:
-        return Affine2D.identity().skew(
-            -radians(self.xSkewAngle), radians(self.ySkewAngle)
-        )
+        return _skew_transform(self.xSkewAngle, self.ySkewAngle)
 
 
-@dataclasses.dataclass(frozen=True)
+@dataclasses.dataclass(frozen=True, **_SLOTS)
 class PaintSkewAroundCenter(Paint):
     format: ClassVar[int] = int(ot.PaintFormat.PaintSkewAroundCenter)
     paint: Paint
@@ -691,13 +778,10 @@ class PaintSkewAroundCenter(Paint):
     ySkewAngle: float = 0.0
     center: Point = Point()
 
-    def colors(self):
-        yield from self.paint.colors()
-
-    def to_ufo_paint(self, colors):
+    def to_ufo_paint(self, colors, ufo_paints=None):
         paint = {
             "Format": self.format,
-            "Paint": self.paint.to_ufo_paint(colors),
+            "Paint": self.paint.to_ufo_paint(colors, ufo_paints),
             "xSkewAngle": self.xSkewAngle,
             "ySkewAngle": self.ySkewAngle,
             "centerX": self.center[0],
@@ -709,31 +793,22 @@ class PaintSkewAroundCenter(Paint):
         return (self.paint,)
 
     def gettransform(self) -> Affine2D:
-        return (
-            Affine2D.identity()
-            .translate(self.center[0], self.center[1])
-            .skew(-radians(self.xSkewAngle), radians(self.ySkewAngle))
-            .translate(-self.center[0], -self.center[1])
-        )
+        return _skew_transform(self.xSkewAngle, self.ySkewAngle, *self.center)
 
 
-@dataclasses.dataclass(frozen=True)
+@dataclasses.dataclass(frozen=True, **_SLOTS)
 class PaintComposite(Paint):
     format: ClassVar[int] = int(ot.PaintFormat.PaintComposite)
     mode: CompositeMode
     source: Paint
     backdrop: Paint
 
-    def colors(self):
-        yield from self.source.colors()
-        yield from self.backdrop.colors()
-
-    def to_ufo_paint(self, colors):
+    def to_ufo_paint(self, colors, ufo_paints=None):
         paint = {
             "Format": self.format,
-            "CompositeMode": self.mode.name.lower(),
-            "SourcePaint": self.source.to_ufo_paint(colors),
-            "BackdropPaint": self.backdrop.to_ufo_paint(colors),
+            "CompositeMode": _COMPOSITE_MODE_NAMES[self.mode],
+            "SourcePaint": self.source.to_ufo_paint(colors, ufo_paints),
+            "BackdropPaint": self.backdrop.to_ufo_paint(colors, ufo_paints),
         }
         return paint
 
@@ -741,41 +816,66 @@ class PaintComposite(Paint):
         return (self.source, self.backdrop)
 
 
+# for Paint.from_ot, by ot.PaintFormat name
+_PAINT_CLASSES = {
+    paint_t.__name__: paint_t
+    for paint_t in (
+        PaintColrLayers,
+        PaintSolid,
+        PaintLinearGradient,
+        PaintRadialGradient,
+        PaintGlyph,
+        PaintColrGlyph,
+        PaintTransform,
+        PaintTranslate,
+        PaintScale,
+        PaintScaleAroundCenter,
+        PaintScaleUniform,
+        PaintScaleUniformAroundCenter,
+        PaintRotate,
+        PaintRotateAroundCenter,
+        PaintSkew,
+        PaintSkewAroundCenter,
+        PaintComposite,
+    )
+}
+
+
+# plain ints, so the predicates below don't go through IntEnum comparisons
+_TRANSFORM_LO = int(ot.PaintFormat.PaintTransform)
+_TRANSFORM_HI = int(ot.PaintFormat.PaintVarSkewAroundCenter)
+_GRADIENT_LO = int(ot.PaintFormat.PaintLinearGradient)
+_GRADIENT_HI = int(ot.PaintFormat.PaintVarSweepGradient)
+
+
 def is_transform(paint_or_format) -> bool:
     if isinstance(paint_or_format, Paint):
         paint_or_format = paint_or_format.format
-    return (
-        ot.PaintFormat.PaintTransform
-        <= paint_or_format
-        <= ot.PaintFormat.PaintVarSkewAroundCenter
-    )
+    return _TRANSFORM_LO <= paint_or_format <= _TRANSFORM_HI
 
 
 def is_gradient(paint_or_format) -> bool:
     if isinstance(paint_or_format, Paint):
         paint_or_format = paint_or_format.format
-    return (
-        ot.PaintFormat.PaintLinearGradient
-        <= paint_or_format
-        <= ot.PaintFormat.PaintVarSweepGradient
-    )
+    return _GRADIENT_LO <= paint_or_format <= _GRADIENT_HI
 
 
 def transformed(transform: Affine2D, target: Paint) -> Paint:
-    if transform == Affine2D.identity():
+    if transform is _IDENTITY or transform == _IDENTITY:
         return target
-
     sx, b, c, sy, dx, dy = transform
 
-    # Int16 translation?
-    if (dx, dy) != (0, 0) and Affine2D.identity().translate(dx, dy) == transform:
+    if sx == 1 and sy == 1 and b == 0 and c == 0:
+        # Identity?
+        if dx == 0 and dy == 0:
+            return target
+        # Int16 translation?
         if int16_safe(dx, dy):
             return PaintTranslate(paint=target, dx=dx, dy=dy)
-
-    # Scale?
-    # If all we have are scale and translation this is pure scaling
-    # If b,c are present this is some sort of rotation or skew
-    if (sx, sy) != (1, 1) and (b, c) == (0, 0) and f2dot14_safe(sx, sy):
+    elif b == 0 and c == 0 and f2dot14_safe(sx, sy):
+        # Scale?
+        # If all we have are scale and translation this is pure scaling
+        # If b,c are present this is some sort of rotation or skew
         if (dx, dy) == (0, 0):
             if almost_equal(sx, sy):
                 return PaintScaleUniform(paint=target, scale=sx)
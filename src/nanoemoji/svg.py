@@ -27,6 +27,7 @@ from nanoemoji.disjoint_set import DisjointSet
 from nanoemoji.glyph_reuse import GlyphReuseCache, ReuseResult
 from nanoemoji.paint import (
     _BasePaintTransform,
+    _BLACK,
     CompositeMode,
     Extend,
     Paint,
@@ -185,10 +186,8 @@ def _svg_matrix(transform: Affine2D) -> str:
 
 def _apply_solid_paint(el: etree.Element, paint: PaintSolid):
     if etree.QName(el.tag).localname == "g":
-        assert paint.color.opaque() == Color.fromstring(
-            "black"
-        ), "Unexpected color choice"
-    if paint.color.opaque() != Color.fromstring("black"):
+        assert paint.color.opaque() == _BLACK, "Unexpected color choice"
+    if paint.color.opaque() != _BLACK:
         el.attrib["fill"] = paint.color.opaque().to_string()
     if paint.color.alpha != 1.0:
         el.attrib["opacity"] = _ntos(paint.color.alpha)
@@ -12,7 +12,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from typing import Any, Mapping, Optional
+import functools
+from typing import Any, Mapping, Optional, Tuple
 import itertools
 from fontTools.pens.basePen import AbstractPen, DecomposingPen
 from fontTools.pens.transformPen import TransformPen
@@ -30,6 +31,13 @@ _SVG_CMD_TO_PEN_METHOD = {
 }
 
 
+@functools.lru_cache(maxsize=4096)
+def _cmd_seq(d: str) -> Tuple[Tuple[str, Tuple[float, ...]], ...]:
+    # as_cmd_seq re-tokenizes and normalizes the path; identical paths are common
+    # (e.g. when reuse is off) so memoize on the path data
+    return tuple((cmd, tuple(args)) for cmd, args in SVGPath(d=d).as_cmd_seq())
+
+
 def draw_svg_path(
     path: SVGPath,
     pen: AbstractPen,
@@ -44,7 +52,7 @@ def draw_svg_path(
     # the end of each sub-path must be marked explicitly with either pen.endPath()
     # for open paths or closePath() for closed ones.
     closed = True
-    for cmd, args in path.as_cmd_seq():
+    for cmd, args in _cmd_seq(path.d):
         if cmd == "M":
             if not closed:
                 if close_subpaths:
@@ -59,6 +59,14 @@ def expand_ninja_response_files(argv: List[str]) -> List[str]:
     return result
 
 
+def is_stale(output_file: Path, input_file: Path) -> bool:
+    # The test ninja applies, for tools that take a batch of edges from it
+    return (
+        not output_file.is_file()
+        or output_file.stat().st_mtime_ns < input_file.stat().st_mtime_ns
+    )
+
+
 def fs_root() -> Path:
     return Path("/").resolve()
 
@@ -33,7 +33,7 @@ from itertools import chain
 from lxml import etree  # pytype: disable=import-error
 from nanoemoji.bitmap_tables import make_cbdt_table, make_sbix_table
 from nanoemoji import codepoints, config, glyphmap
-from nanoemoji.colors import Color, uniq_sort_cpal_colors
+from nanoemoji.colors import Color, palette_index_map, uniq_sort_cpal_colors
 from nanoemoji.config import FontConfig
 from nanoemoji.color_glyph import ColorGlyph
 from nanoemoji.fixed import fixed_safe
@@ -63,7 +63,6 @@ from ufo2ft.outlineCompiler import StubGlyph
 from picosvg.svg import SVG
 from picosvg.svg_transform import Affine2D
 from picosvg.svg_types import SVGPath
-import regex
 import sys
 from typing import (
     cast,
@@ -72,6 +71,7 @@ from typing import (
     Generator,
     Iterable,
     Mapping,
+    MutableMapping,
     MutableSequence,
     NamedTuple,
     Optional,
@@ -90,6 +90,10 @@ flags.DEFINE_string("glyphmap_file", None, "Glyphmap filename.")
 flags.DEFINE_string("part_file", None, "Reusable parts filename.")
 
 
+# Affine2D is immutable; share one identity rather than making one per layer
+_IDENTITY = Affine2D.identity()
+
+
 # A GlyphMapping plus an SVG, typically a picosvg, and/or a PNG
 class InputGlyph(NamedTuple):
     svg_file: Optional[Path]  # either filenames can be omitted, mostly for debugging
@@ -256,25 +260,48 @@ def _not_impl(func_name, color_format, *_):
     raise NotImplementedError(f"{func_name} for {color_format} not implemented")
 
 
-def _next_name(ufo: ufoLib2.Font, name_fn) -> str:
-    i = 0
-    while name_fn(i) in ufo:
-        i += 1
-    return name_fn(i)
+class _NewGlyphs:
+    """Makes the glyphs color glyphs are built from, named {color glyph}.{i}.
+
+    Remembers the next free i per prefix, rather than probing the ufo from 0 every
+    time, and collects new names to be set as glyph order once at the end.
+    """
+
+    def __init__(self, ufo: ufoLib2.Font):
+        self._ufo = ufo
+        self._next_index = Counter()
+        # ufo.glyphOrder returns a copy; accumulate new glyphs and set it once
+        self.glyph_order = ufo.glyphOrder
+
+    def _next_name(self, prefix: str) -> str:
+        i = self._next_index[prefix]
+        while f"{prefix}{i}" in self._ufo:
+            i += 1
+        self._next_index[prefix] = i + 1
+        return f"{prefix}{i}"
+
+    def create(self, color_glyph: ColorGlyph) -> Glyph:
+        glyph = self._ufo.newGlyph(self._next_name(_name_prefix(color_glyph)))
+        glyph.width = color_glyph.ufo_glyph.width
+        self.glyph_order.append(glyph.name)
+        return glyph
 
 
 def _create_glyph(
-    color_glyph: ColorGlyph, paint: PaintGlyph, path_in_font_space: str
+    color_glyph: ColorGlyph,
+    paint: PaintGlyph,
+    path_in_font_space: str,
+    new_glyphs: _NewGlyphs,
 ) -> Glyph:
-    glyph = _init_glyph(color_glyph)
-    ufo = color_glyph.ufo
+    glyph = new_glyphs.create(color_glyph)
     draw_svg_path(SVGPath(d=path_in_font_space), glyph.getPen())
-    ufo.glyphOrder += [glyph.name]
     return glyph
 
 
 def _migrate_paths_to_ufo_glyphs(
-    color_glyph: ColorGlyph, glyph_cache: GlyphReuseCache
+    color_glyph: ColorGlyph,
+    glyph_cache: GlyphReuseCache,
+    new_glyphs: _NewGlyphs,
 ) -> ColorGlyph:
     svg_units_to_font_units = color_glyph.transform_for_font_space()
 
@@ -296,7 +323,7 @@ def _migrate_paths_to_ufo_glyphs(
         reuse_result = glyph_cache.try_reuse(path_in_font_space)
         if reuse_result is not None:
             # TODO: when is it more compact to use a new transforming glyph?
-            child_transform = Affine2D.identity()
+            child_transform = _IDENTITY
             child_paint = paint.paint
             if is_transform(child_paint):
                 child_transform = child_paint.gettransform()
@@ -333,7 +360,7 @@ def _migrate_paths_to_ufo_glyphs(
                     ),
                 )
 
-        glyph = _create_glyph(color_glyph, paint, path_in_font_space)
+        glyph = _create_glyph(color_glyph, paint, path_in_font_space, new_glyphs)
         glyph_cache.add_glyph(glyph.name, path_in_font_space)
 
         return dataclasses.replace(paint, glyph=glyph.name)
@@ -377,40 +404,63 @@ def _draw_notdef(config: FontConfig, ufo: ufoLib2.Font):
     notdefArtist.draw(glyph.getPen())
 
 
-def _glyf_ufo(
-    config: FontConfig, ufo: ufoLib2.Font, color_glyphs: Tuple[ColorGlyph, ...]
-):
-    # We want to mutate our view of color_glyphs
-    color_glyphs = list(color_glyphs)
+def _migrate_all_paths_to_ufo_glyphs(
+    config: FontConfig,
+    ufo: ufoLib2.Font,
+    color_glyphs: Tuple[ColorGlyph, ...],
+    on_color_glyph: Callable[[ColorGlyph, _NewGlyphs], None],
+) -> Tuple[ColorGlyph, ...]:
+    """Generate (reused where possible) ufo glyphs for every PaintGlyph.
 
+    Returns the updated color glyphs. on_color_glyph(color_glyph, new_glyphs) is
+    called for each as it's updated and must make any glyph it needs via new_glyphs.
+    """
     # glyphs by reuse_key
     glyph_cache = GlyphReuseCache(config.reuse_tolerance)
-    glyph_uses = Counter()
-    for i, color_glyph in enumerate(color_glyphs):
-        logging.debug(
-            "%s %s %s",
-            ufo.info.familyName,
-            color_glyph.ufo_glyph_name,
-            color_glyph.transform_for_font_space(),
-        )
-        parent_glyph = color_glyph.ufo_glyph
+    new_glyphs = _NewGlyphs(ufo)
+    updated_color_glyphs = []
+    for color_glyph in color_glyphs:
+        # transform_for_font_space() isn't free, don't compute it just to drop it
+        if logging.level_debug():
+            logging.debug(
+                "%s %s %s",
+                ufo.info.familyName,
+                color_glyph.ufo_glyph_name,
+                color_glyph.transform_for_font_space(),
+            )
 
         # generate glyphs for PaintGlyph's and assign glyph names
-        color_glyphs[i] = color_glyph = _migrate_paths_to_ufo_glyphs(
-            color_glyph, glyph_cache
-        )
+        color_glyph = _migrate_paths_to_ufo_glyphs(color_glyph, glyph_cache, new_glyphs)
+        on_color_glyph(color_glyph, new_glyphs)
+        updated_color_glyphs.append(color_glyph)
+
+    ufo.glyphOrder = new_glyphs.glyph_order
+    return tuple(updated_color_glyphs)
+
+
+def _glyf_ufo(
+    config: FontConfig, ufo: ufoLib2.Font, color_glyphs: Tuple[ColorGlyph, ...]
+):
+    glyph_uses = Counter()
 
+    def _add_components(color_glyph: ColorGlyph, _):
+        components = []
         for root in color_glyph.painted_layers:
             for context in root.breadth_first():
                 # For 'glyf' just dump anything that isn't a PaintGlyph
                 if not isinstance(context.paint, PaintGlyph):
                     continue
-                paint_glyph = cast(PaintGlyph, context.paint)
-                glyph = ufo.get(paint_glyph.glyph)
-                parent_glyph.components.append(
-                    Component(baseGlyph=glyph.name, transformation=context.transform)
+                # PaintGlyph.glyph is already the name of the ufo glyph
+                base_glyph = cast(PaintGlyph, context.paint).glyph
+                components.append(
+                    Component(baseGlyph=base_glyph, transformation=context.transform)
                 )
-                glyph_uses[glyph.name] += 1
+                glyph_uses[base_glyph] += 1
+        color_glyph.ufo_glyph.components.extend(components)
+
+    color_glyphs = _migrate_all_paths_to_ufo_glyphs(
+        config, ufo, color_glyphs, _add_components
+    )
 
     # No great reason to keep single-component glyphs around (unless reused)
     for color_glyph in color_glyphs:
@@ -430,30 +480,23 @@ def _name_prefix(color_glyph: ColorGlyph) -> Glyph:
     return f"{color_glyph.ufo_glyph_name}."
 
 
-def _init_glyph(color_glyph: ColorGlyph) -> Glyph:
-    ufo = color_glyph.ufo
-    glyph = ufo.newGlyph(_next_name(ufo, lambda i: f"{_name_prefix(color_glyph)}{i}"))
-    glyph.width = ufo.get(color_glyph.glyph_name).width
-    return glyph
-
-
-def _init_glyph(color_glyph: ColorGlyph) -> Glyph:
-    ufo = color_glyph.ufo
-    glyph = ufo.newGlyph(_next_name(ufo, lambda i: f"{_name_prefix(color_glyph)}{i}"))
-    glyph.width = color_glyph.ufo_glyph.width
-    return glyph
-
-
 def _create_transformed_glyph(
-    color_glyph: ColorGlyph, paint: PaintGlyph, transform: Affine2D
+    color_glyph: ColorGlyph,
+    paint: PaintGlyph,
+    transform: Affine2D,
+    new_glyphs: _NewGlyphs,
 ) -> Glyph:
-    glyph = _init_glyph(color_glyph)
+    glyph = new_glyphs.create(color_glyph)
     glyph.components.append(Component(baseGlyph=paint.glyph, transformation=transform))
-    color_glyph.ufo.glyphOrder += [glyph.name]
     return glyph
 
 
-def _colr0_layers(color_glyph: ColorGlyph, root: Paint, palette: Sequence[Color]):
+def _colr0_layers(
+    color_glyph: ColorGlyph,
+    root: Paint,
+    palette: Mapping[Color, int],
+    new_glyphs: _NewGlyphs,
+):
     # COLRv0: write out each PaintGlyph we see in it's first color
     # If we see a transformed glyph generate a component
     # Results for complex structures will be suboptimal :)
@@ -465,12 +508,12 @@ def _colr0_layers(color_glyph: ColorGlyph, root: Paint, palette: Sequence[Color]
         paint_glyph: PaintGlyph = (
             context.paint
         )  # pytype: disable=annotation-type-mismatch
-        color = next(paint_glyph.colors())
+        color = next(iter(paint_glyph.colors()))
         glyph_name = paint_glyph.glyph
 
-        if context.transform != Affine2D.identity():
+        if context.transform != _IDENTITY:
             glyph_name = _create_transformed_glyph(
-                color_glyph, paint_glyph, context.transform
+                color_glyph, paint_glyph, context.transform, new_glyphs
             ).name
 
         layers.append((glyph_name, color.index_from(palette)))
@@ -507,7 +550,7 @@ def _transformed_glyph_bounds(
 ) -> Optional[Tuple[float, float, float, float]]:
     glyph = ufo[glyph_name]
     pen = bounds_pen = ControlBoundsPen(ufo)
-    if not transform.almost_equals(Affine2D.identity()):
+    if not transform.almost_equals(_IDENTITY):
         pen = TransformPen(bounds_pen, transform)
     glyph.draw(pen)
     return bounds_pen.bounds
@@ -543,7 +586,11 @@ def _bounds(
 
 
 def _ufo_colr_layers(
-    colr_version: int, colors: Sequence[Color], color_glyph: ColorGlyph
+    colr_version: int,
+    color_index: Mapping[Color, int],
+    ufo_paints: MutableMapping[Paint, Any],
+    color_glyph: ColorGlyph,
+    new_glyphs: _NewGlyphs,
 ):
     # The value for a COLOR_LAYERS_KEY entry per
     # https://github.com/googlefonts/ufo2ft/pull/359
@@ -552,9 +599,11 @@ def _ufo_colr_layers(
     # accumulate layers in z-order
     for paint in color_glyph.painted_layers:
         if colr_version == 0:
-            colr_layers.extend(_colr0_layers(color_glyph, paint, colors))
+            colr_layers.extend(
+                _colr0_layers(color_glyph, paint, color_index, new_glyphs)
+            )
         elif colr_version == 1:
-            colr_layers.append(paint.to_ufo_paint(colors))
+            colr_layers.append(paint.to_ufo_paint(color_index, ufo_paints))
         else:
             raise ValueError(f"Invalid color version {colr_version}")
 
@@ -575,19 +624,21 @@ def _colr_ufo(
 ):
     black = Color(0, 0, 0, 1.0)
 
-    # We want to mutate our view of color glyphs
-    color_glyphs = list(color_glyphs)
+    # Glyphs share most of their colors; dedup before doing any per-color work
+    glyph_colors = set(chain.from_iterable(g.colors() for g in color_glyphs))
 
     # We only store opaque colors in CPAL for COLRv1, as 'alpha' is
     # encoded separately.
     colors = uniq_sort_cpal_colors(
         (
             c if colr_version == 0 else c.opaque()
-            for c in chain.from_iterable(g.colors() for g in color_glyphs)
+            for c in glyph_colors
             if not c.is_current_color()
         )
     )
     logging.debug("colors %s", colors)
+    color_index = palette_index_map(colors)
+    ufo_paints = {}  # paint => its ufo paint, for the paints that reuse theirs
 
     # KISS; use a single global palette
     ufo.lib[ufo2ft.constants.COLOR_PALETTES_KEY] = [[c.to_ufo_color() for c in colors]]
@@ -595,36 +646,24 @@ def _colr_ufo(
     # each base glyph maps to a list of (glyph name, paint info) in z-order
     ufo_color_layers = {}
 
-    # potentially reusable glyphs
-    glyph_cache = GlyphReuseCache(config.reuse_tolerance)
-
     clipBoxes = {}
     quantization = config.clipbox_quantization
     if quantization is None:
         # by default, quantize clip boxes to an integer value 2% of the UPEM
         quantization = round(config.upem * 0.02)
-    for i, color_glyph in enumerate(color_glyphs):
-        logging.debug(
-            "%s %s %s",
-            ufo.info.familyName,
-            color_glyph.ufo_glyph_name,
-            color_glyph.transform_for_font_space(),
-        )
-
-        # generate glyphs for PaintGlyph's and assign glyph names
-        color_glyphs[i] = color_glyph = _migrate_paths_to_ufo_glyphs(
-            color_glyph, glyph_cache
-        )
 
+    def _add_color_layers(color_glyph: ColorGlyph, new_glyphs: _NewGlyphs):
         if color_glyph.painted_layers:
             # write out the ufo structures for COLR
             ufo_color_layers[color_glyph.ufo_glyph_name] = _ufo_colr_layers(
-                colr_version, colors, color_glyph
+                colr_version, color_index, ufo_paints, color_glyph, new_glyphs
             )
         bounds = _bounds(color_glyph, quantization)
         if bounds is not None:
             clipBoxes.setdefault(bounds, []).append(color_glyph.ufo_glyph_name)
 
+    _migrate_all_paths_to_ufo_glyphs(config, ufo, color_glyphs, _add_color_layers)
+
     ufo.lib[ufo2ft.constants.COLOR_LAYERS_KEY] = ufo_color_layers
     if clipBoxes:
         if colr_version == 0:
@@ -685,23 +724,19 @@ def _picosvg_and_cbdt(
     make_cbdt_table(config, ttfont, color_glyphs)
 
 
-def _ensure_codepoints_will_have_glyphs(ufo, glyph_inputs):
+def _ensure_codepoints_will_have_glyphs(ufo, glyph_inputs: Sequence[InputGlyph]):
     """Ensure all codepoints we use will have a glyph.
 
     Single codepoint sequences will directly mapped to their glyphs.
     We need to add a glyph for any codepoint that is only used in a multi-codepoint sequence.
 
     """
-    all_codepoints = set()
-    direct_mapped_codepoints = set()
-    for glyph_input in glyph_inputs:
-        if not glyph_input.codepoints:
-            continue
-        if len(glyph_input.codepoints) == 1:
-            direct_mapped_codepoints.update(glyph_input.codepoints)
-        all_codepoints.update(glyph_input.codepoints)
+    all_codepoints = set().union(*(g.codepoints for g in glyph_inputs))
+    direct_mapped_codepoints = {
+        g.codepoints[0] for g in glyph_inputs if len(g.codepoints) == 1
+    }
 
-    need_blanks = all_codepoints - direct_mapped_codepoints
+    need_blanks = sorted(all_codepoints - direct_mapped_codepoints)
     logging.debug("%d codepoints require blanks", len(need_blanks))
     glyph_names = []
     for codepoint in need_blanks:
@@ -713,7 +748,7 @@ def _ensure_codepoints_will_have_glyphs(ufo, glyph_inputs):
     ufo.glyphOrder = ufo.glyphOrder + sorted(glyph_names)
 
 
-def _generate_color_font(config: FontConfig, inputs: Iterable[InputGlyph]):
+def _generate_color_font(config: FontConfig, inputs: Sequence[InputGlyph]):
     """Make a UFO and optionally a TTFont from svgs."""
     ufo = _ufo(config)
     _ensure_codepoints_will_have_glyphs(ufo, inputs)
@@ -721,11 +756,11 @@ def _generate_color_font(config: FontConfig, inputs: Iterable[InputGlyph]):
     color_glyphs = []
     glyph_order = list(ufo.glyphOrder)
     assert glyph_order[0] == ".notdef"
+    glyph_ids = {name: gid for gid, name in enumerate(glyph_order)}
     for glyph_input in inputs:
-        if glyph_input.glyph_name in glyph_order:
-            gid = glyph_order.index(glyph_input.glyph_name)
-        else:
-            gid = len(glyph_order)
+        gid = glyph_ids.get(glyph_input.glyph_name)
+        if gid is None:
+            gid = glyph_ids[glyph_input.glyph_name] = len(glyph_order)
             glyph_order.append(glyph_input.glyph_name)
 
         color_glyphs.append(
@@ -748,7 +783,7 @@ def _generate_color_font(config: FontConfig, inputs: Iterable[InputGlyph]):
     # of COLRv1 ClipRecords
     ufo.glyphOrder = glyph_order
     for g in color_glyphs:
-        ufo_gid = ufo.glyphOrder.index(g.ufo_glyph_name)
+        ufo_gid = glyph_ids[g.ufo_glyph_name]
         assert (
             g.glyph_id == ufo_gid
         ), f"{g.ufo_glyph_name} is {ufo_gid} in ufo, {g.glyph_id} in ColorGlyph"
@@ -758,7 +793,7 @@ def _generate_color_font(config: FontConfig, inputs: Iterable[InputGlyph]):
     if config.fea_file:
         with open(config.fea_file) as f:
             ufo.features.text = f.read()
-        logging.debug("fea:\n%s\n" % ufo.features.text)
+        logging.debug("fea:\n%s\n", ufo.features.text)
     else:
         logging.debug("No fea")
 
@@ -830,7 +865,7 @@ def main(argv):
         sys.exit("Please provide at least one svg filename")
     ufo, ttfont = _generate_color_font(font_config, inputs)
     _write(ufo, ttfont, font_config.output_file)
-    logging.info("Wrote %s" % font_config.output_file)
+    logging.info("Wrote %s", font_config.output_file)
 
 
 if __name__ == "__main__":
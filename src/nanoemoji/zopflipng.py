@@ -0,0 +1,66 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Runs zopflipng over many bitmaps in one process.
+
+Running `python -m zopfli.png` once per bitmap spends most of its time starting
+the interpreter, so the build hands this a batch of inputs followed by the
+matching outputs instead. Outputs newer than their input are left as they are.
+
+Usage:
+
+    $ python -m nanoemoji.zopflipng IN_1 ... IN_N OUT_1 ... OUT_N
+"""
+
+from absl import app
+from absl import flags
+from absl import logging
+from nanoemoji import util
+from pathlib import Path
+import sys
+from zopfli.png import main as zopflipng
+
+
+FLAGS = flags.FLAGS
+
+
+def main(argv):
+    args = util.expand_ninja_response_files(argv[1:])
+    if len(args) % 2 != 0:
+        raise ValueError(f"Expected inputs followed by as many outputs, got {args}")
+    n = len(args) // 2
+
+    # -y is to always overwrite existing output without Y/N interactive prompt
+    zopfli_args = ["-y"]
+    if FLAGS.verbosity:
+        zopfli_args.append("-v")
+    # ninja reruns the whole batch when any one input changes, only redo stale outputs.
+    # Carry on past a bad input so it doesn't hold up the rest of the batch
+    failed = []
+    for input_file, output_file in zip(map(Path, args[:n]), map(Path, args[n:])):
+        if not util.is_stale(output_file, input_file):
+            continue
+        try:
+            zopflipng([*zopfli_args, str(input_file), str(output_file)])
+        except Exception:
+            logging.exception(f"zopflipng failed for {input_file}")
+            if output_file.is_file():
+                output_file.unlink()
+            failed.append(str(input_file))
+    if failed:
+        sys.exit(f"zopflipng failed for {len(failed)} of {n} input(s): {failed}")
+
+
+if __name__ == "__main__":
+    app.run(main)
@@ -12,7 +12,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from nanoemoji.colors import Color, uniq_sort_cpal_colors
+from nanoemoji.colors import Color, palette_index_map, uniq_sort_cpal_colors
 import pytest
 
 
@@ -173,3 +173,15 @@ def test_uniq_sort_cpal_colors_ambiguous_indices():
                 Color(0, 0x80, 0, 1.0, palette_index=1),
             ]
         )
+
+
+def test_index_from_palette_index_map():
+    black = Color.fromstring("black")
+    red = Color.fromstring("red")
+    # gaps in CPAL are padded with black; first occurrence wins, like list.index
+    palette = [black, red, black]
+    color_index = palette_index_map(palette)
+
+    assert color_index == {black: 0, red: 1}
+    for color in (black, red, Color.current_color()):
+        assert color.index_from(color_index) == color.index_from(palette)
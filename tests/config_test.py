@@ -13,6 +13,7 @@
 # limitations under the License.
 
 from nanoemoji import config
+import os
 from pathlib import Path
 import pytest
 from test_helper import test_data_dir, locate_test_file
@@ -46,6 +47,20 @@ def test_read_write_config(config_file):
     shutil.rmtree(tmp_dir, ignore_errors=True)
 
 
+def test_write_leaves_identical_config_alone(tmp_path):
+    tmp_config = tmp_path / "config.toml"
+    original = config.load()
+    config.write(tmp_config, original)
+    os.utime(tmp_config, (0, 0))
+
+    config.write(tmp_config, original)
+    assert tmp_config.stat().st_mtime == 0
+
+    config.write(tmp_config, original._replace(family="Changed"))
+    assert tmp_config.stat().st_mtime > 0
+    assert config.load(tmp_config).family == "Changed"
+
+
 @pytest.mark.parametrize(
     "relative_base, src, expected_files",
     [
@@ -40,3 +40,17 @@ def test_glyph_reuse_cache(path_a, path_b, expected_result):
     reuse_cache = GlyphReuseCache(_DEFAULT_CONFIG.reuse_tolerance)
     reuse_cache.add_glyph("A", path_a)
     assert reuse_cache.try_reuse(path_b) == expected_result
+
+
+def test_glyph_reuse_cache_exact_repeat():
+    path = "M-1,-1 L 0,1 L 1, -1 z"
+    reuse_cache = GlyphReuseCache(_DEFAULT_CONFIG.reuse_tolerance)
+    reuse_cache.add_glyph("A", path)
+    assert reuse_cache.try_reuse(path) == ReuseResult(
+        glyph_name="A", transform=Affine2D.identity()
+    )
+
+    # reuse disabled means no reuse, not even of an identical path
+    reuse_cache = GlyphReuseCache(-1)
+    reuse_cache.add_glyph("A", path)
+    assert reuse_cache.try_reuse(path) is None
@@ -17,9 +17,12 @@
 from fontTools.ttLib import TTFont
 from fontTools.ttLib.tables import otTables as ot
 from functools import lru_cache
+import io
 from lxml import etree  # pytype: disable=import-error
 from nanoemoji import config
 from nanoemoji.glyph import glyph_name
+from nanoemoji.nanoemoji import _write_batched_builds
+from nanoemoji.ninja import NinjaWriter
 from nanoemoji.util import only
 import operator
 import os
@@ -27,6 +30,7 @@ from pathlib import Path
 from picosvg.svg import SVG
 from picosvg.svg_transform import Affine2D
 import pytest
+import re
 import shutil
 import subprocess
 import tempfile
@@ -66,6 +70,22 @@ def test_build_static_font_default_config_cli_svg_list():
     assert "fvar" not in font
 
 
+def test_parallel_picosvg_matches_ninja_picosvg():
+    svgs = [locate_test_file(f"emoji_u{cp}.svg") for cp in ("25fd", "42")]
+
+    ninja_dir = run_nanoemoji(svgs)
+    parallel_dir = run_nanoemoji(("--parallel_picosvg", *svgs))
+
+    # picosvgs are made up front rather than by ninja
+    assert ": picosvg_" not in (parallel_dir / "build.ninja").read_text()
+    ninja_font = TTFont(ninja_dir / "Font.ttf")
+    parallel_font = TTFont(parallel_dir / "Font.ttf")
+    for tag in ("glyf", "COLR", "CPAL"):
+        assert parallel_font[tag].compile(parallel_font) == ninja_font[tag].compile(
+            ninja_font
+        )
+
+
 def _build_and_check_ttx(config_overrides, svgs, expected_ttx):
     config_file = mkdtemp() / "config.toml"
     font_config, glyph_inputs = color_font_config(
@@ -431,3 +451,47 @@ def test_build_output_file_with_spaces(font_type):
     assert output_file.is_file()
 
     assert "COLR" in TTFont(output_file)
+
+
+def test_batched_builds_stay_put():
+    def _builds(edges):
+        f = io.StringIO()
+        _write_batched_builds(NinjaWriter(f), "a_rule", edges, 4)
+        return set(re.split(r"^build ", f.getvalue(), flags=re.MULTILINE)[1:])
+
+    edges = [(Path(f"out/{i}.svg"), Path(f"{i}.svg")) for i in range(20)]
+    before = _builds(edges)
+    after = _builds(edges + [(Path("out/new.svg"), Path("new.svg"))])
+
+    # just the batch that took the new edge changed
+    assert len(before) == len(after) > 1
+    assert len(after - before) == 1
+
+
+@pytest.mark.parametrize(
+    "args, output_glob",
+    [
+        ((), "picosvg/clipped/*"),
+        (("--color_format", "cbdt", "--use_zopflipng"), "zopflipng/*"),
+    ],
+)
+def test_rebuild_redoes_only_changed_input(tmp_path, args, output_glob):
+    svgs = []
+    for name in ("emoji_u42.svg", "emoji_u25fd.svg", "minimal_static/svg/61.svg"):
+        svgs.append(tmp_path / Path(name).name)
+        shutil.copyfile(locate_test_file(name), svgs[-1])
+    build_dir = tmp_path / "build"
+
+    run_nanoemoji((*svgs, *args), tmp_dir=build_dir)
+    mtimes = {p: p.stat().st_mtime_ns for p in build_dir.glob(output_glob)}
+    assert len(mtimes) >= len(svgs)
+
+    # well past the first build, timestamp granularity can't hide the change
+    changed = svgs[0]
+    mtime = changed.stat().st_mtime + 10
+    os.utime(changed, (mtime, mtime))
+    run_nanoemoji((*svgs, *args), tmp_dir=build_dir)
+
+    rebuilt = {p.name for p, mtime in mtimes.items() if p.stat().st_mtime_ns != mtime}
+    assert rebuilt
+    assert {name.split(".")[0] for name in rebuilt} == {changed.stem}
@@ -0,0 +1,74 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from absl.testing import flagsaver
+import io
+from pathlib import Path
+
+from nanoemoji.ninja import NinjaWriter, build_dir, rel_build
+
+import pytest
+
+
+@pytest.mark.parametrize(
+    "edges, variables",
+    [
+        ([(Path("out/a.png"), Path("a.svg"))], None),
+        (
+            [(Path("out/a.png"), Path("a.svg")), (Path("out/b.png"), Path("b.svg"))],
+            {"res": 128},
+        ),
+        # paths needing escapes fall back to ninja_syntax
+        (
+            [
+                (Path("out/a.png"), Path("a.svg")),
+                (Path("out/b c.png"), Path("b c.svg")),
+                (Path("out/d.png"), Path("C:/d$.svg")),
+                (Path("out/e.png"), Path("e.svg")),
+            ],
+            {"flags": "--quality 80", "file": Path("x y.txt")},
+        ),
+    ],
+)
+def test_build_many_matches_build(edges, variables):
+    expected = io.StringIO()
+    nw = NinjaWriter(expected)
+    for dest, src in edges:
+        nw.build(dest, "rule_name", src, variables=dict(variables or {}))
+
+    actual = io.StringIO()
+    NinjaWriter(actual).build_many("rule_name", edges, variables=variables)
+
+    assert actual.getvalue() == expected.getvalue()
+
+
+def test_build_dir_follows_cwd(tmp_path, monkeypatch):
+    (tmp_path / "sub").mkdir()
+    tmp_path = tmp_path.resolve()
+
+    with flagsaver.flagsaver(build_dir="build"):
+        monkeypatch.chdir(tmp_path)
+        assert build_dir() == tmp_path / "build"
+        monkeypatch.chdir(tmp_path / "sub")
+        assert build_dir() == tmp_path / "sub" / "build"
+
+
+def test_rel_build_follows_cwd(tmp_path, monkeypatch):
+    (tmp_path / "sub").mkdir()
+
+    with flagsaver.flagsaver(build_dir=str(tmp_path / "build")):
+        monkeypatch.chdir(tmp_path)
+        assert rel_build(Path("a.svg")) == Path("../a.svg")
+        monkeypatch.chdir(tmp_path / "sub")
+        assert rel_build(Path("a.svg")) == Path("../sub/a.svg")
@@ -30,12 +30,57 @@ import pytest
                 "Alpha": 1,
             },
         ),
+        # palette given as a map from color to index
+        (
+            PaintLinearGradient(
+                stops=(
+                    ColorStop(0.0, Color.fromstring("red")),
+                    ColorStop(1.0, Color(0, 0, 255, 0.5)),
+                ),
+                p0=Point(0, 0),
+                p1=Point(1, 0),
+            ),
+            {Color.fromstring("blue"): 0, Color.fromstring("red"): 1},
+            {
+                "Format": ot.PaintFormat.PaintLinearGradient,
+                "ColorLine": {
+                    "ColorStop": [
+                        {"StopOffset": 0.0, "PaletteIndex": 1, "Alpha": 1.0},
+                        {"StopOffset": 1.0, "PaletteIndex": 0, "Alpha": 0.5},
+                    ],
+                    "Extend": "pad",
+                },
+                "x0": 0,
+                "y0": 0,
+                "x1": 1,
+                "y1": 0,
+                "x2": 0,
+                "y2": 1,
+            },
+        ),
     ],
 )
 def test_to_ufo_paint(paint, colors, expected_ufo_paint):
     assert paint.to_ufo_paint(colors) == expected_ufo_paint
 
 
+def test_to_ufo_paint_reuses_leaves_only_within_ufo_paints():
+    solid = PaintSolid(color=Color.fromstring("red"))
+    root = PaintColrLayers(
+        (PaintGlyph("a", solid), PaintGlyph("b", PaintSolid(Color.fromstring("red"))))
+    )
+    colors = [Color.fromstring("red")]
+
+    ufo_paint = root.to_ufo_paint(colors)
+    assert ufo_paint["Layers"][0]["Paint"] is not ufo_paint["Layers"][1]["Paint"]
+    assert solid.to_ufo_paint(colors) is not solid.to_ufo_paint(colors)
+
+    ufo_paints = {}
+    ufo_paint = root.to_ufo_paint(colors, ufo_paints)
+    assert ufo_paint["Layers"][0]["Paint"] is ufo_paint["Layers"][1]["Paint"]
+    assert ufo_paints == {solid: ufo_paint["Layers"][0]["Paint"]}
+
+
 @pytest.mark.parametrize(
     "input_point, paint, expected_point",
     [
@@ -91,6 +136,52 @@ def test_gettransform(input_point, paint, expected_point):
     assert paint.gettransform().map_point(input_point).round(6) == expected_point
 
 
+def test_breadth_first():
+    solid = PaintSolid()
+    rotate = PaintRotate(paint=PaintGlyph(glyph="a", paint=solid), angle=90)
+    translate = PaintTranslate(paint=rotate, dx=10, dy=20)
+    root = PaintColrLayers((translate, PaintGlyph(glyph="b", paint=solid)))
+
+    contexts = list(root.breadth_first())
+
+    assert [type(c.paint).__name__ for c in contexts] == [
+        "PaintColrLayers",
+        "PaintTranslate",
+        "PaintGlyph",
+        "PaintRotate",
+        "PaintSolid",
+        "PaintGlyph",
+        "PaintSolid",
+    ]
+    assert contexts[-1].path == (root, translate, rotate, rotate.paint)
+    # siblings share their parent's path
+    assert contexts[1].path is contexts[2].path
+    assert contexts[-1].transform == Affine2D.compose_ltr(
+        (translate.gettransform(), rotate.gettransform())
+    )
+    # paints that don't transform leave their children's transform alone
+    assert contexts[1].transform == contexts[2].transform == Affine2D.identity()
+
+
+def test_colors():
+    red, green, blue = (Color.fromstring(c) for c in ("red", "green", "blue"))
+    gradient = PaintLinearGradient(stops=(ColorStop(0, green), ColorStop(1, blue)))
+    root = PaintColrLayers(
+        (
+            PaintComposite(
+                mode=CompositeMode.SRC_IN,
+                source=PaintGlyph(glyph="a", paint=PaintSolid(red)),
+                backdrop=PaintRotate(paint=PaintGlyph(glyph="b", paint=gradient)),
+            ),
+            PaintColrGlyph(glyph="c"),
+            PaintGlyph(glyph="d", paint=PaintSolid(blue)),
+        )
+    )
+
+    assert tuple(root.colors()) == (red, green, blue, blue)
+    assert tuple(gradient.colors()) == (green, blue)
+
+
 @pytest.mark.parametrize(
     "transform, target, expected_result",
     [
@@ -231,3 +322,38 @@ def test_decompose_uniform_transform(
         expected_uniform_transform,
         expected_remaining_transform,
     )
+
+
+@pytest.mark.parametrize(
+    "paint, expected_error",
+    [
+        (
+            PaintLinearGradient(
+                p0=Point(0, 0), p1=Point(32767, -32768), p2=Point(-32768, 32767)
+            ),
+            None,
+        ),
+        (
+            PaintLinearGradient(p0=Point(0, 0), p1=Point(0, 32768)),
+            r"PaintLinearGradient.p1\[1\] \(32768\) is out of bounds",
+        ),
+        (
+            PaintRadialGradient(c0=Point(-32768, 0), c1=Point(0, 0), r1=65535),
+            None,
+        ),
+        (
+            PaintRadialGradient(c0=Point(0, -32769), c1=Point(0, 0)),
+            r"PaintRadialGradient.c0\[1\] \(-32769\) is out of bounds",
+        ),
+        (
+            PaintRadialGradient(r0=-1),
+            r"PaintRadialGradient.r0 \(-1\) is out of bounds",
+        ),
+    ],
+)
+def test_check_overflows(paint, expected_error):
+    if expected_error is None:
+        assert paint.check_overflows() is paint
+    else:
+        with pytest.raises(OverflowError, match=expected_error):
+            paint.check_overflows()
@@ -193,15 +193,18 @@ def assert_expected_ttx(
     skip_tables=("head", "hhea", "maxp", "name", "post", "OS/2"),
 ):
     actual_ttx = io.StringIO()
-    # Timestamps inside files #@$@#%@#
-    # force consistent Unix newlines (the expected test files use \n too)
-    ttfont.saveXML(
-        actual_ttx,
-        newlinestr="\n",
-        tables=include_tables,
-        skipTables=skip_tables,
-        bitmapGlyphDataFormat="extfile",
-    )
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # extfile bitmaps go in bitmaps/ next to the file, cwd if it has no name
+        actual_ttx.name = os.path.join(tmp_dir, expected_ttx)
+        # Timestamps inside files #@$@#%@#
+        # force consistent Unix newlines (the expected test files use \n too)
+        ttfont.saveXML(
+            actual_ttx,
+            newlinestr="\n",
+            tables=include_tables,
+            skipTables=skip_tables,
+            bitmapGlyphDataFormat="extfile",
+        )
 
     # Elide ttFont attributes because ttLibVersion may change
     actual = re.sub(r'\s+ttLibVersion="[^"]+"', "", actual_ttx.getvalue())